@@ -0,0 +1,123 @@
+#
+# bytewords.py
+#
+# Minimal Bytewords throughput: the table-driven bulk codec against the
+# word-at-a-time path it replaced.
+#
+# Run from the repository root:
+#
+#     python -m benchmarks.bytewords
+#
+
+import os
+import timeit
+
+from foundation.bytewords import BYTEWORDS, Bytewords, Bytewords_Style_minimal
+from foundation.utils import crc32_bytes, partition
+
+SIZES = [100, 1000, 10000]
+DURATION = 0.5
+
+
+# Word-at-a-time reference, as the codec worked before the lookup tables
+REFERENCE_WORD_ARRAY = None
+
+def reference_decode_word(word, word_len):
+    global REFERENCE_WORD_ARRAY
+
+    if len(word) != word_len:
+        raise ValueError('Invalid Bytewords.')
+
+    dim = 26
+
+    if REFERENCE_WORD_ARRAY == None:
+        REFERENCE_WORD_ARRAY = [-1] * (dim * dim)
+
+        for i in range(256):
+            byteword_offset = i * 4
+            x = ord(BYTEWORDS[byteword_offset]) - ord('a')
+            y = ord(BYTEWORDS[byteword_offset + 3]) - ord('a')
+            array_offset = y * dim + x
+            REFERENCE_WORD_ARRAY[array_offset] = i
+
+    x = ord(word[0].lower()) - ord('a')
+    y = ord((word[3 if len(word) == 4 else 1]).lower()) - ord('a')
+    if not (0 <= x and x < dim and 0 <= y and y < dim):
+        raise ValueError('Invalid Bytewords.')
+
+    offset = y * dim + x
+    value = REFERENCE_WORD_ARRAY[offset]
+    if value == -1:
+        raise ValueError('Invalid Bytewords.')
+
+    if len(word) == 4:
+        byteword_offset = value * 4
+        c1 = word[1].lower()
+        c2 = word[2].lower()
+        if c1 != BYTEWORDS[byteword_offset + 1] or c2 != BYTEWORDS[byteword_offset + 2]:
+            raise ValueError('Invalid Bytewords.')
+
+    return value
+
+
+def reference_get_minimal_word(index):
+    byteword_offset = index * 4
+    return BYTEWORDS[byteword_offset] + BYTEWORDS[byteword_offset + 3]
+
+
+def reference_encode(buf):
+    result = ''
+
+    crc_buf = buf + crc32_bytes(buf)
+    for i in range(len(crc_buf)):
+        byte = crc_buf[i]
+        result += reference_get_minimal_word(byte)
+
+    return result
+
+
+def reference_decode(s):
+    buf = bytearray()
+
+    for word in partition(s, 2):
+        buf.append(reference_decode_word(word, 2))
+
+    if len(buf) < 5:
+        raise ValueError('Invalid Bytewords.')
+
+    body = buf[0:-4]
+    body_checksum = buf[-4:]
+    checksum = crc32_bytes(body)
+    if checksum != body_checksum:
+        raise ValueError('Invalid Bytewords.')
+
+    return body
+
+
+def mb_per_s(func, arg, size):
+    timer = timeit.Timer(lambda: func(arg))
+    (number, elapsed) = timer.autorange()
+    while elapsed < DURATION:
+        number *= 2
+        elapsed = timer.timeit(number)
+    return size * number / elapsed / 1e6
+
+
+def main():
+    print('{:>8} {:>14} {:>14} {:>14} {:>14}'.format('bytes', 'old enc MB/s', 'new enc MB/s', 'old dec MB/s', 'new dec MB/s'))
+    for size in SIZES:
+        buf = os.urandom(size)
+        encoded = Bytewords.encode(Bytewords_Style_minimal, buf)
+        assert reference_encode(buf) == encoded
+        assert reference_decode(encoded) == Bytewords.decode(Bytewords_Style_minimal, encoded)
+
+        print('{:>8} {:>14.2f} {:>14.2f} {:>14.2f} {:>14.2f}'.format(
+            size,
+            mb_per_s(reference_encode, buf, size),
+            mb_per_s(lambda b: Bytewords.encode(Bytewords_Style_minimal, b), buf, size),
+            mb_per_s(reference_decode, encoded, size),
+            mb_per_s(lambda s: Bytewords.decode(Bytewords_Style_minimal, s), encoded, size)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#
+# ur.py
+#
+# End-to-end multi-part UR throughput: UREncoder.next_part, then
+# URDecoder.receive_part fed with in-order, shuffled, lossy and
+# duplicate-heavy part streams until the message is complete. No camera or
+# display is needed. Results are printed and written as JSON, so runs on
+# different commits can be compared.
+#
+# Run from the repository root:
+#
+#     python -m benchmarks.ur
+#     python -m benchmarks.ur --sizes 1000 100000 --fragments 200 --out before.json
+#
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+
+from itertools import islice
+
+from foundation.ur import UR
+from foundation.ur_encoder import UREncoder
+from foundation.ur_decoder import URDecoder
+from foundation.fountain_decoder import Engine_Peeling, Engine_Gaussian
+
+PAYLOAD_SIZES = [100, 1000, 10000, 100000, 1000000]
+FRAGMENT_SIZES = [50, 200, 1000]
+STREAMS = ['in-order', 'shuffled', 'lossy-10', 'lossy-30', 'lossy-50', 'duplicates']
+
+# Parts encoded to measure the encoder, at most
+ENCODE_PARTS = 2000
+# The shuffled stream is a shuffle of this many times seq_len first parts
+SHUFFLE_WINDOW = 2
+# Each part of the duplicate-heavy stream is repeated 1 to this many times
+MAX_REPEATS = 10
+# A stream still incomplete after this many seconds, generating its parts
+# included, is reported as such (large messages with small fragments mix
+# thousands of fragments per part, which takes long to encode and to peel)
+TIMEOUT = 60.0
+# Parts generated and then decoded at a time
+BATCH = 256
+SEED = 1
+
+
+def stream_parts(kind, ur, fragment_len, seq_len, rng, deadline):
+    # Part strings in the order a reader would see them, until the deadline
+    encoder = UREncoder(ur, fragment_len)
+
+    if kind == 'shuffled':
+        window = []
+        for _ in range(seq_len * SHUFFLE_WINDOW):
+            if time.perf_counter() > deadline:
+                return
+            window.append(encoder.next_part())
+        rng.shuffle(window)
+        yield from window
+
+    loss = int(kind.split('-')[1]) / 100 if kind.startswith('lossy') else 0
+    while time.perf_counter() < deadline:
+        part = encoder.next_part()
+        if loss and rng.random() < loss:
+            continue
+        repeats = rng.randint(1, MAX_REPEATS) if kind == 'duplicates' else 1
+        for _ in range(repeats):
+            yield part
+
+
+def bench_encode(ur, fragment_len):
+    encoder = UREncoder(ur, fragment_len)
+    count = min(ENCODE_PARTS, max(encoder.fountain_encoder.seq_len() * 2, 100))
+    start = time.perf_counter()
+    for _ in range(count):
+        encoder.next_part()
+    seconds = time.perf_counter() - start
+    return {
+        'parts': count,
+        'seconds': seconds,
+        'parts_per_s': count / seconds,
+        'fragment_bytes_per_s': count * encoder.fountain_encoder.fragment_len / seconds,
+    }
+
+
+def bench_decode(kind, ur, fragment_len, seq_len, engine, timeout):
+    rng = random.Random(SEED)
+    wall_start = time.perf_counter()
+    deadline = wall_start + timeout
+    # Each batch of strings is generated before timing the decoder on it
+    parts = stream_parts(kind, ur, fragment_len, seq_len, rng, deadline)
+    decoder = URDecoder(engine)
+
+    fed = 0
+    decode_time = 0.0
+    unique = set()
+    while not decoder.is_complete():
+        batch = list(islice(parts, BATCH))
+        if not batch:
+            break
+        start = time.perf_counter()
+        for used, part in enumerate(batch, 1):
+            decoder.receive_part(part)
+            if decoder.is_complete() or time.perf_counter() > deadline:
+                break
+        decode_time += time.perf_counter() - start
+        fed += used
+        unique.update(batch[:used])
+
+    success = bool(decoder.is_success()) and decoder.result_message().cbor == ur.cbor
+    return {
+        'complete': decoder.is_complete(),
+        'success': success,
+        'parts_fed': fed,
+        'unique_parts': len(unique),
+        'overhead': fed / seq_len,
+        'seconds': decode_time,
+        'parts_per_s': fed / decode_time if decode_time else 0,
+        'wall_seconds': time.perf_counter() - wall_start,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.ur')
+    parser.add_argument('--sizes', type=int, nargs='+', default=PAYLOAD_SIZES, help="payload sizes in bytes")
+    parser.add_argument('--fragments', type=int, nargs='+', default=FRAGMENT_SIZES, help="maximum fragment lengths")
+    parser.add_argument('--streams', nargs='+', choices=STREAMS, default=STREAMS)
+    parser.add_argument('--engine', choices=[Engine_Peeling, Engine_Gaussian], default=Engine_Peeling)
+    parser.add_argument('--timeout', type=float, default=TIMEOUT, help="seconds allowed per stream")
+    parser.add_argument('--out', default='ur-benchmark.json', help="JSON results file")
+    args = parser.parse_args(argv)
+
+    results = []
+    print('{:>8} {:>6} {:>6} {:>11} {:>11} {:>9} {:>8} {:>11} {:>9}'.format(
+        'payload', 'frag', 'parts', 'enc part/s', 'stream', 'fed', 'overhead', 'dec part/s', 'decode s'))
+
+    for size in args.sizes:
+        ur = UR('bytes', bytearray(random.Random(size).randbytes(size)))
+        for fragment_len in args.fragments:
+            seq_len = UREncoder(ur, fragment_len).fountain_encoder.seq_len()
+            encode = bench_encode(ur, fragment_len)
+            result = {'payload': size, 'max_fragment_len': fragment_len, 'seq_len': seq_len,
+                      'encode': encode, 'decode': {}}
+
+            for kind in args.streams:
+                decode = bench_decode(kind, ur, fragment_len, seq_len, args.engine, args.timeout)
+                result['decode'][kind] = decode
+                print('{:>8} {:>6} {:>6} {:>11.0f} {:>11} {:>9} {:>8.2f} {:>11.0f} {:>9.3f}{}'.format(
+                    size, fragment_len, seq_len, encode['parts_per_s'], kind, decode['parts_fed'],
+                    decode['overhead'], decode['parts_per_s'], decode['seconds'],
+                    '' if decode['success'] else '  incomplete'))
+                sys.stdout.flush()
+
+            results.append(result)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'engine': args.engine,
+        'seed': SEED,
+        'results': results,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#
+# xor.py
+#
+# Per-part cost of mixing fragments: the pure-Python byte loop against the
+# whole-buffer integer XOR used by FountainEncoder and FountainDecoder.
+#
+# Run from the repository root:
+#
+#     python -m benchmarks.xor
+#
+
+import os
+import timeit
+
+from foundation.fountain_encoder import FountainEncoder
+from foundation.utils import xor_into, bytes_to_int, int_to_data
+
+FRAGMENT_SIZES = [10, 30, 100, 300, 1000]
+DEGREE = 3
+NUMBER = 2000
+
+
+def mix_loop(fragments, fragment_len):
+    result = [0] * fragment_len
+    for fragment in fragments:
+        xor_into(result, fragment)
+    return bytes(result)
+
+
+def mix_int(values, fragment_len):
+    result = 0
+    for value in values:
+        result ^= value
+    return int_to_data(result, fragment_len)
+
+
+def per_part_us(func, *args):
+    return timeit.timeit(lambda: func(*args), number=NUMBER) / NUMBER * 1e6
+
+
+def main():
+    print('{:>10} {:>12} {:>12} {:>8} {:>14}'.format('fragment', 'loop us', 'int us', 'speedup', 'next_part us'))
+    for fragment_len in FRAGMENT_SIZES:
+        fragments = [os.urandom(fragment_len) for _ in range(DEGREE)]
+        values = [bytes_to_int(fragment) for fragment in fragments]
+
+        loop = per_part_us(mix_loop, fragments, fragment_len)
+        fast = per_part_us(mix_int, values, fragment_len)
+
+        encoder = FountainEncoder(bytearray(os.urandom(fragment_len * 20)), fragment_len)
+        next_part = per_part_us(encoder.next_part)
+
+        print('{:>10} {:>12.2f} {:>12.2f} {:>7.1f}x {:>14.2f}'.format(fragment_len, loop, fast, loop / fast, next_part))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+import os
+import sys
+import time
+import threading
+
+from dataclasses import dataclass, field, asdict, fields
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from lazy import LazyModule
+
+cv2 = LazyModule('cv2')
+qrcode = LazyModule('qrcode')
+
+SYSFS_VIDEO = '/sys/class/video4linux'
+DEV = '/dev'
+
+# Indexes tried where the OS can't tell which cameras exist
+PROBE_INDEXES = 10
+PROBE_TIMEOUT = 3.0
+# How often the UI checks /dev for cameras being plugged in or out (ms)
+POLL_INTERVAL = 2000
+
+# Resolutions asked for when probing a camera, the driver answers with the
+# closest one it supports
+COMMON_RESOLUTIONS = [(320, 240), (640, 480), (800, 600), (1280, 720), (1920, 1080)]
+
+CODECS = ('MJPG', 'YUYV')
+
+# Auto-tune keeps QR modules at least this many pixels wide (times the margin)
+MIN_MODULE_PIXELS = 3
+AUTO_TUNE_MARGIN = 1.25
+# Seconds between resolution changes, and without any code before stepping up
+AUTO_TUNE_INTERVAL = 2.0
+AUTO_TUNE_TIMEOUT = 3.0
+
+
+@dataclass
+class CameraInfo:
+    index: int
+    name: str = ''
+    available: bool = False
+    # (width, height, fps) the camera accepted
+    modes: list = field(default_factory=list)
+
+    def label(self) -> str:
+        return f"{self.index}: {self.name}" if self.name else str(self.index)
+
+    def key(self) -> str:
+        # Name the capture profile is stored under, indexes change on replug
+        return self.name or str(self.index)
+
+    def resolutions(self) -> list:
+        resolutions = sorted({(width, height) for width, height, fps in self.modes})
+        return resolutions or list(COMMON_RESOLUTIONS)
+
+
+@dataclass
+class CaptureProfile:
+    # 0 and '' keep the driver defaults
+    width: int = 0
+    height: int = 0
+    fps: int = 0
+    codec: str = ''
+    auto: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @staticmethod
+    def from_dict(data) -> 'CaptureProfile':
+        names = {f.name for f in fields(CaptureProfile)}
+        return CaptureProfile(**{k: v for k, v in (data or {}).items() if k in names})
+
+
+def open_capture(index: int, profile: CaptureProfile):
+    cap = cv2.VideoCapture(index)
+    # The pixel format has to be chosen before the frame size
+    if profile.codec:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*profile.codec))
+    if profile.width and profile.height:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, profile.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, profile.height)
+    if profile.fps:
+        cap.set(cv2.CAP_PROP_FPS, profile.fps)
+    # Don't let the driver queue up stale frames
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def qr_modules(data: bytes) -> int:
+    # Modules per side of the smallest QR code holding `data`, at the error
+    # correction level the Send tab uses
+    qr = qrcode.QRCode(error_correction=qrcode.ERROR_CORRECT_M)
+    qr.add_data(data)
+    return 17 + 4 * qr.best_fit()
+
+
+class AutoTuner:
+    # Picks the smallest resolution at which the codes being read still have
+    # MIN_MODULE_PIXELS per module. Starts at the smallest one and steps up
+    # while nothing gets decoded.
+
+    def __init__(self, resolutions):
+        self.resolutions = sorted(resolutions, key=lambda r: r[0] * r[1])
+        self.current = 0
+        self.last_change = self.last_seen = time.monotonic()
+
+    def resolution(self) -> tuple:
+        return self.resolutions[self.current]
+
+    def update(self, symbols, frame_width: int, now: float) -> tuple | None:
+        # Feed the result of one decoded frame, returns the resolution to
+        # switch to, if any
+        if now - self.last_change < AUTO_TUNE_INTERVAL:
+            return None
+
+        codes = [symbol for symbol in symbols if symbol.type == 'QRCODE']
+        if codes:
+            self.last_seen = now
+            pixels = min(min(code.rect.width, code.rect.height) / qr_modules(code.data) for code in codes)
+            needed = frame_width * MIN_MODULE_PIXELS * AUTO_TUNE_MARGIN / max(pixels, 1e-6)
+            target = next(
+                (i for i, (width, height) in enumerate(self.resolutions) if width >= needed),
+                len(self.resolutions) - 1,
+            )
+        elif now - self.last_seen >= AUTO_TUNE_TIMEOUT:
+            target = min(self.current + 1, len(self.resolutions) - 1)
+        else:
+            return None
+
+        if target == self.current:
+            return None
+        self.current = target
+        self.last_change = now
+        return self.resolution()
+
+
+def sysfs_devices() -> dict | None:
+    # Capture devices known to the kernel: index -> name, None when not on Linux.
+    # UVC cameras also expose a metadata node, only the first node of each
+    # device (sysfs `index` 0) can capture.
+    if not sys.platform.startswith('linux') or not os.path.isdir(SYSFS_VIDEO):
+        return None
+
+    devices = {}
+    for entry in os.listdir(SYSFS_VIDEO):
+        if not entry.startswith('video'):
+            continue
+        try:
+            index = int(entry[len('video'):])
+        except ValueError:
+            continue
+
+        node = os.path.join(SYSFS_VIDEO, entry)
+        if read_sysfs(node, 'index') not in (None, '0'):
+            continue
+        devices[index] = read_sysfs(node, 'name') or ''
+    return devices
+
+
+def read_sysfs(node, name):
+    try:
+        with open(os.path.join(node, name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def dev_signature():
+    # Cheap check for cameras being plugged in or out
+    try:
+        return frozenset(entry for entry in os.listdir(DEV) if entry.startswith('video'))
+    except OSError:
+        return None
+
+
+def probe(index: int, name: str = '') -> CameraInfo:
+    camera = CameraInfo(index, name)
+    cap = cv2.VideoCapture(index)
+    try:
+        if not cap.isOpened():
+            return camera
+        camera.available = True
+
+        modes = set()
+        for width, height in COMMON_RESOLUTIONS:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            modes.add((
+                int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                round(cap.get(cv2.CAP_PROP_FPS)),
+            ))
+        camera.modes = sorted(mode for mode in modes if mode[0] and mode[1])
+    finally:
+        cap.release()
+    return camera
+
+
+class CameraRegistry:
+    # Cached camera discovery. Candidates come from sysfs on Linux (a fixed
+    # range of indexes elsewhere), are probed concurrently with a timeout,
+    # and only new candidates get probed again on later refreshes.
+
+    def __init__(self):
+        self.cameras = {}
+        self.probing = {}
+        self.signature = None
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=4)
+
+    def changed(self) -> bool:
+        return dev_signature() != self.signature
+
+    def refresh(self, full: bool = False) -> list:
+        signature = dev_signature()
+        devices = sysfs_devices()
+        if devices is None:
+            devices = {index: '' for index in range(PROBE_INDEXES)}
+
+        with self.lock:
+            if full:
+                self.cameras = {}
+            # Forget devices that went away or now are something else
+            for index in list(self.cameras):
+                if devices.get(index) != self.cameras[index].name:
+                    del self.cameras[index]
+            todo = {index: name for index, name in devices.items() if index not in self.cameras}
+
+            # A probe that timed out last time is still running, wait on it
+            # again rather than opening the device twice
+            for index, name in todo.items():
+                if index not in self.probing:
+                    self.probing[index] = self.pool.submit(probe, index, name)
+            futures = {self.probing[index]: index for index in todo}
+
+        done, _ = wait(futures, timeout=PROBE_TIMEOUT)
+
+        with self.lock:
+            for future in done:
+                index = futures[future]
+                self.probing.pop(index, None)
+                try:
+                    camera = future.result()
+                except Exception as e:
+                    print(f"camera {index}: {e}")
+                    continue
+                if camera.name == devices.get(index):
+                    self.cameras[index] = camera
+            self.signature = signature
+            return self.available()
+
+    def available(self) -> list:
+        return [camera for index, camera in sorted(self.cameras.items()) if camera.available]
+
+    def get(self, index: int) -> CameraInfo | None:
+        return self.cameras.get(index)
@@ -0,0 +1,283 @@
+import sys
+import os
+import glob
+import time
+import argparse
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from qr_data import MultiQRCode, MAX_LEN, read_part, to_str
+
+# Commands handled here, without Qt ever being imported (OpenCV is only
+# loaded by `decode`)
+COMMANDS = ('encode', 'decode')
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+
+DEFAULT_FPS = 3
+
+
+def positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def positive_float(value):
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive number")
+    return number
+
+
+def read_input(path):
+    if path == '-':
+        return sys.stdin.read().strip()
+    with open(path, 'r') as f:
+        return f.read().strip()
+
+
+def make_parts(data, max_len, data_type, format, count):
+    # MultiQRCode reports progress with print(), keep stdout for the parts
+    with redirect_stdout(sys.stderr):
+        qr = MultiQRCode.from_string(data, max=max_len, type=data_type, format=format)
+
+    if not qr:
+        raise ValueError(f"cannot encode data of type {data_type} as {format}")
+
+    if not isinstance(qr, MultiQRCode):
+        return [qr.data]
+
+    if count is None:
+        count = qr.total_sequences
+    return qr.parts(count)
+
+
+def qr_image(data, image_factory):
+    import qrcode
+
+    qr = qrcode.QRCode(image_factory=image_factory)
+    qr.add_data(data)
+    qr.make(fit=False)
+    return qr.make_image()
+
+
+def write_frames(parts, out_dir, image_format):
+    if image_format == 'svg':
+        from qrcode.image.svg import SvgPathImage as factory
+    else:
+        from qrcode.image.pure import PyPNGImage as factory
+
+    paths = []
+    for i, part in enumerate(parts):
+        path = os.path.join(out_dir, f"frame_{i + 1:04d}.{image_format}")
+        with open(path, 'wb') as f:
+            qr_image(part, factory).save(f)
+        paths.append(path)
+    return paths
+
+
+def write_animation(parts, out_dir, animation, fps):
+    from PIL import Image
+    from qrcode.image.pil import PilImage
+
+    images = [qr_image(part, PilImage).get_image().convert('L') for part in parts]
+
+    # Frames of different QR versions are centered on a canvas of the largest size
+    side = max(image.width for image in images)
+    frames = []
+    for image in images:
+        frame = Image.new('L', (side, side), 255)
+        offset = (side - image.width) // 2
+        frame.paste(image, (offset, offset))
+        frames.append(frame)
+
+    extension = 'gif' if animation == 'gif' else 'png'
+    path = os.path.join(out_dir, f"animation.{extension}")
+    frames[0].save(
+        path,
+        format=extension.upper(),
+        save_all=True,
+        append_images=frames[1:],
+        duration=round(1000 / fps),
+        loop=0,
+    )
+    return path
+
+
+def encode(args):
+    data = read_input(args.input)
+    if not data:
+        print("no data to encode", file=sys.stderr)
+        return 1
+
+    max_len = args.max if args.max > 0 else None
+    data_type = args.type if args.format == 'UR' else None
+
+    try:
+        parts = make_parts(data, max_len, data_type, args.format, args.count)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    if args.out is None:
+        for part in parts:
+            print(part)
+        return 0
+
+    os.makedirs(args.out, exist_ok=True)
+    if args.image != 'none':
+        write_frames(parts, args.out, args.image)
+    if args.animation != 'none':
+        write_animation(parts, args.out, args.animation, args.fps)
+    print(f"{len(parts)} parts written to {args.out}", file=sys.stderr)
+    return 0
+
+
+def decode_image(image):
+    # Runs in a worker process: `image` is a file path or a grayscale frame
+    import cv2
+    from pyzbar import pyzbar
+
+    if isinstance(image, str):
+        image = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            return []
+    return [to_str(symbol.data) for symbol in pyzbar.decode(image)]
+
+
+def image_files(source):
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source)
+    return sorted(path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def video_frames(capture):
+    import cv2
+
+    try:
+        while True:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    finally:
+        capture.release()
+
+
+def frames_from(source):
+    if os.path.isdir(source) or glob.has_magic(source) or source.lower().endswith(IMAGE_EXTENSIONS):
+        paths = image_files(source)
+        if not paths:
+            raise ValueError(f"no images found in {source}")
+        return iter(paths)
+
+    # Opened here rather than in the generator, so a bad path fails right away
+    import cv2
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"cannot open {source}")
+    return video_frames(capture)
+
+
+def decode(args):
+    start = time.monotonic()
+    frames_read = 0
+    parts_used = 0
+    unique_parts = set()
+    qr_data = None
+    # Set when the data was complete but could not be converted
+    failed = False
+
+    try:
+        frames = frames_from(args.source)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    # Frames are decoded in parallel but read back in order, a bounded number
+    # ahead, so reading can stop as soon as the data is complete
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        pending = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < args.jobs * 4:
+                frame = next(frames, None)
+                if frame is None:
+                    exhausted = True
+                    break
+                frames_read += 1
+                pending.append(pool.submit(decode_image, frame))
+
+            if not pending:
+                break
+
+            for data in pending.popleft().result():
+                parts_used += 1
+                unique_parts.add(data)
+                try:
+                    # MultiQRCode reports progress with print(), keep stdout for the result
+                    with redirect_stdout(sys.stderr):
+                        qr_data = read_part(qr_data, data)
+                except Exception as e:
+                    print(e, file=sys.stderr)
+                    failed = bool(qr_data and qr_data.is_completed)
+
+            if failed or (qr_data and qr_data.is_completed):
+                for future in pending:
+                    future.cancel()
+                break
+
+    elapsed = time.monotonic() - start
+    completed = bool(qr_data and qr_data.is_completed and qr_data.data) and not failed
+    if completed:
+        print(qr_data.data)
+
+    print(f"frames read: {frames_read}, parts used: {parts_used} ({len(unique_parts)} unique), "
+          f"wall time: {elapsed:.2f}s, complete: {'yes' if completed else 'no'}", file=sys.stderr)
+    return 0 if completed else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='seedqreader')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enc = commands.add_parser('encode', help="encode data as (animated) QR code parts")
+    enc.add_argument('input', nargs='?', default='-', help="file to encode, '-' for stdin (default)")
+    enc.add_argument('--format', choices=['Specter', 'UR'], default='Specter')
+    enc.add_argument('--type', choices=['Descriptor', 'PSBT', 'Key', 'Bytes'], default='Descriptor',
+                     help="data type, for the UR format")
+    enc.add_argument('--max', type=int, default=MAX_LEN,
+                     help="split size / maximum fragment length, 0 to not split")
+    enc.add_argument('--count', type=positive_int, default=None,
+                     help="number of parts, one full sequence by default")
+    enc.add_argument('--out', default=None,
+                     help="directory to write images to, parts go to stdout when omitted")
+    enc.add_argument('--image', choices=['png', 'svg', 'none'], default='png',
+                     help="format of the frame images written to --out")
+    enc.add_argument('--animation', choices=['gif', 'apng', 'none'], default='none',
+                     help="also write all frames as one animation to --out")
+    enc.add_argument('--fps', type=positive_float, default=DEFAULT_FPS, help="animation frame rate")
+    enc.set_defaults(func=encode)
+
+    dec = commands.add_parser('decode', help="decode QR codes from a video file or images")
+    dec.add_argument('source', help="video file, image file, glob pattern or directory of frames")
+    dec.add_argument('--jobs', type=positive_int, default=os.cpu_count() or 1, help="number of decoding processes")
+    dec.set_defaults(func=decode)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
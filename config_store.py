@@ -0,0 +1,94 @@
+import os
+import sys
+import copy
+import tempfile
+import threading
+
+from yaml import load, dump
+
+try:
+    from yaml import CSafeLoader as Loader, CSafeDumper as Dumper
+except ImportError:
+    from yaml import SafeLoader as Loader, SafeDumper as Dumper
+
+APP_NAME = 'seedqreader'
+# Where the config lived before, relative to the working directory
+LEGACY_PATH = 'config'
+
+# Saves are delayed by this many seconds, so a burst of changes is written once
+SAVE_DELAY = 0.5
+
+
+def default_path() -> str:
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Application Support')
+    else:
+        base = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    return os.path.join(base, APP_NAME, 'config.yaml')
+
+
+class ConfigStore:
+    # YAML config kept in memory. The file is parsed again only when its
+    # mtime changes, and saves are debounced and written atomically (temp
+    # file + rename) on a background thread.
+
+    def __init__(self, path: str | None = None):
+        self.path = path or default_path()
+        self.data = {}
+        self.mtime = None
+        self.lock = threading.Lock()
+        self.timer = None
+        self.pending = None
+
+    def load(self) -> dict:
+        # Doesn't create the file, a missing config is just empty
+        path = self.path
+        if not os.path.exists(path) and os.path.exists(LEGACY_PATH):
+            path = LEGACY_PATH
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return self.data
+
+        with self.lock:
+            # Unsaved changes win over the file
+            if mtime != self.mtime and self.pending is None:
+                with open(path, 'r') as f:
+                    self.data = load(f, Loader=Loader) or {}
+                self.mtime = mtime
+            return self.data
+
+    def save(self):
+        # Snapshot now, write a little later
+        with self.lock:
+            self.pending = copy.deepcopy(self.data)
+            if self.timer:
+                self.timer.cancel()
+            self.timer = threading.Timer(SAVE_DELAY, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            data, self.pending = self.pending, None
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+            if data is None:
+                return
+
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix='.config-')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    dump(data, f, Dumper=Dumper)
+                os.replace(tmp, self.path)
+            except Exception:
+                os.unlink(tmp)
+                raise
+            # Our own write doesn't need to be read back
+            self.mtime = os.stat(self.path).st_mtime_ns
@@ -5,71 +5,44 @@
 # Licensed under the "BSD-2-Clause Plus Patent License"
 #
 
-from .utils import crc32_bytes, partition
+import sys
+
+from .utils import crc32_bytes
 
 BYTEWORDS = 'ableacidalsoapexaquaarchatomauntawayaxisbackbaldbarnbeltbetabiasbluebodybragbrewbulbbuzzcalmcashcatschefcityclawcodecolacookcostcruxcurlcuspcyandarkdatadaysdelidicedietdoordowndrawdropdrumdulldutyeacheasyechoedgeepicevenexamexiteyesfactfairfernfigsfilmfishfizzflapflewfluxfoxyfreefrogfuelfundgalagamegeargemsgiftgirlglowgoodgraygrimgurugushgyrohalfhanghardhawkheathelphighhillholyhopehornhutsicedideaidleinchinkyintoirisironitemjadejazzjoinjoltjowljudojugsjumpjunkjurykeepkenokeptkeyskickkilnkingkitekiwiknoblamblavalazyleaflegsliarlimplionlistlogoloudloveluaulucklungmainmanymathmazememomenumeowmildmintmissmonknailnavyneednewsnextnoonnotenumbobeyoboeomitonyxopenovalowlspaidpartpeckplaypluspoempoolposepuffpumapurrquadquizraceramprealredorichroadrockroofrubyruinrunsrustsafesagascarsetssilkskewslotsoapsolosongstubsurfswantacotasktaxitenttiedtimetinytoiltombtoystriptunatwinuglyundouniturgeuservastveryvetovialvibeviewvisavoidvowswallwandwarmwaspwavewaxywebswhatwhenwhizwolfworkyankyawnyellyogayurtzapszerozestzinczonezoom'
-WORD_ARRAY = None
+# Lookup tables, built once at import time
+WORDS = [BYTEWORDS[i * 4:i * 4 + 4] for i in range(256)]
+MINIMAL_WORDS = [word[0] + word[3] for word in WORDS]
+WORD_TO_BYTE = {word: i for (i, word) in enumerate(WORDS)}
+MINIMAL_WORD_TO_BYTE = {word: i for (i, word) in enumerate(MINIMAL_WORDS)}
+
+# Two-letter minimal words read as native 16-bit integers, in any letter case.
+# Invalid pairs map to 256 so that building a bytearray from them fails.
+MINIMAL_PAIR_TO_BYTE = [256] * 65536
+for (i, word) in enumerate(MINIMAL_WORDS):
+    for pair in (word, word.upper(), word[0].upper() + word[1], word[0] + word[1].upper()):
+        MINIMAL_PAIR_TO_BYTE[int.from_bytes(pair.encode(), sys.byteorder)] = i
 
 def decode_word(word, word_len):
-    global WORD_ARRAY
-    global BYTEWORDS
-
     if len(word) != word_len:
         raise ValueError('Invalid Bytewords.')
 
-    dim = 26
-
-    # Since the first and last letters of each Byteword are unique,
-    # we can use them as indexes into a two-dimensional lookup table.
-    # This table is generated lazily.
-    if WORD_ARRAY == None:
-        WORD_ARRAY = [-1] * (dim * dim)  # create empty array
-
-        for i in range(256):
-            byteword_offset = i * 4
-            x = ord(BYTEWORDS[byteword_offset]) - ord('a')
-            y = ord(BYTEWORDS[byteword_offset + 3]) - ord('a')
-            array_offset = y * dim + x
-            WORD_ARRAY[array_offset] = i
-
-    # If the coordinates generated by the first and last letters are out of bounds,
-    # or the lookup table contains -1 at the coordinates, then the word is not valid.
-    x = ord(word[0].lower()) - ord('a')
-    y = ord((word[3 if len(word) == 4 else 1]).lower()) - ord('a')
-    if not (0 <= x and x < dim and 0 <= y and y < dim):
-        raise ValueError('Invalid Bytewords.')
-
-    offset = y * dim + x
-    value = WORD_ARRAY[offset]
-    if value == -1:
+    table = WORD_TO_BYTE if word_len == 4 else MINIMAL_WORD_TO_BYTE
+    value = table.get(word.lower())
+    if value == None:
         raise ValueError('Invalid Bytewords.')
 
-    # If we're decoding a full four-letter word, verify that the two middle letters are correct.
-    if len(word) == 4:
-        byteword_offset = value * 4
-        c1 = word[1].lower()
-        c2 = word[2].lower()
-        if c1 != BYTEWORDS[byteword_offset + 1] or c2 != BYTEWORDS[byteword_offset + 2]:
-            raise ValueError('Invalid Bytewords.')
-
     # Successful decode.
     return value
 
 def get_word(index):
-    byteword_offset = index * 4
-    return BYTEWORDS[byteword_offset:byteword_offset + 4]
+    return WORDS[index]
 
 def get_minimal_word(index):
-    byteword_offset = index * 4
-    return BYTEWORDS[byteword_offset] + BYTEWORDS[byteword_offset + 3]
+    return MINIMAL_WORDS[index]
 
 def encode(buf, separator):
-    words = []
-    for i in range(len(buf)):
-        byte = buf[i]
-        words.append(get_word(byte))
-
-    return separator.join(words)
+    return separator.join(map(WORDS.__getitem__, buf))
 
 def add_crc(buf):
     crc_buf = crc32_bytes(buf)
@@ -80,25 +53,32 @@ def encode_with_separator(buf, separator):
     return encode(crc_buf, separator)
 
 def encode_minimal(buf):
-    result = ''
+    # Any buffer works, memoryviews included: the CRC words are appended to
+    # the string rather than the CRC bytes to `buf`
+    words = ''.join(map(MINIMAL_WORDS.__getitem__, buf))
+    return words + ''.join(map(MINIMAL_WORDS.__getitem__, crc32_bytes(buf)))
 
-    crc_buf = add_crc(buf)
-    for i in range(len(crc_buf)):
-        byte = crc_buf[i]
-        result += get_minimal_word(byte)
+def decode_minimal(s):
+    if len(s) % 2 != 0:
+        raise ValueError('Invalid Bytewords.')
 
-    return result
+    # Non-ASCII input fails to encode and unknown pairs map to 256, both of
+    # which raise ValueError
+    try:
+        pairs = memoryview(s.encode('ascii')).cast('H')
+        return bytearray(map(MINIMAL_PAIR_TO_BYTE.__getitem__, pairs))
+    except ValueError:
+        raise ValueError('Invalid Bytewords.')
 
 def decode(s, separator, word_len):
-    buf = bytearray()
-
     if word_len == 4:
-        words = s.split(separator)
+        # A missing key covers wrong letters as well as a wrong word length
+        try:
+            buf = bytearray(map(WORD_TO_BYTE.__getitem__, s.lower().split(separator)))
+        except KeyError:
+            raise ValueError('Invalid Bytewords.')
     else:
-        words = partition(s, 2)
-
-    for word in words:
-        buf.append(decode_word(word, word_len))
+        buf = decode_minimal(s)
 
     if len(buf) < 5:
         raise ValueError('Invalid Bytewords.') 
@@ -12,6 +12,8 @@
 # COPYRIGHT.md file in the top-level folder of the CBOR-lite software
 # distribution.
 
+from struct import Struct
+
 def bit_length(n):
     return len(bin(abs(n))) - 2
 
@@ -62,12 +64,54 @@ Tag_Minor_selfDescribeCbor = 55799
 Tag_Minor_mask = 0x1f
 Tag_Undefined = Tag_Major_semantic + Tag_Minor_undefined
 
+# Big-endian layouts of the values following a tag, by minor tag
+Value_Structs = {
+    Tag_Minor_length1: Struct('>B'),
+    Tag_Minor_length2: Struct('>H'),
+    Tag_Minor_length4: Struct('>I'),
+    Tag_Minor_length8: Struct('>Q'),
+}
+
 
 def get_byte_length(value):
     if value < 24:
         return 0
     
-    return (bit_length(value) + 7) // 8
+    return (value.bit_length() + 7) // 8
+
+# Minor tag and layout used to encode a value of `length` significant bytes
+def get_value_struct(length):
+    # 5-8 bytes required, use 8 bytes
+    if length >= 5 and length <= 8:
+        minor = Tag_Minor_length8
+    # 3-4 bytes required, use 4 bytes
+    elif length == 3 or length == 4:
+        minor = Tag_Minor_length4
+    elif length == 2:
+        minor = Tag_Minor_length2
+    elif length == 1:
+        minor = Tag_Minor_length1
+    else:
+        raise Exception("Unsupported byte length of {} for value in encodeTagAndValue()".format(length))
+    return (minor, Value_Structs[minor])
+
+# Size of the encoded tag and value, to size buffers up front
+def get_encoded_size(value):
+    if value < 24:
+        return 1
+    return 1 + get_value_struct(get_byte_length(value))[1].size
+
+# Writes the tag and value at `pos` in `buf`, which must be large enough (see
+# get_encoded_size()). Returns the position after them.
+def encode_value_into(buf, pos, tag, value):
+    if value < 24:
+        buf[pos] = tag + value
+        return pos + 1
+
+    (minor, value_struct) = get_value_struct(get_byte_length(value))
+    buf[pos] = tag + minor
+    value_struct.pack_into(buf, pos + 1, value)
+    return pos + 1 + value_struct.size
 
 class CBOREncoder:
     def __init__(self):
@@ -82,41 +126,12 @@ class CBOREncoder:
 
     def encodeTagAndValue(self, tag, value):
         length = get_byte_length(value)
-
-        # 5-8 bytes required, use 8 bytes
-        if length >= 5 and length <= 8:
-            self.encodeTagAndAdditional(tag, Tag_Minor_length8)
-            self.buf.append((value >> 56) & 0xff)
-            self.buf.append((value >> 48) & 0xff)
-            self.buf.append((value >> 40) & 0xff)
-            self.buf.append((value >> 32) & 0xff)
-            self.buf.append((value >> 24) & 0xff)
-            self.buf.append((value >> 16) & 0xff)
-            self.buf.append((value >> 8) & 0xff)
-            self.buf.append(value & 0xff)
-
-        # 3-4 bytes required, use 4 bytes
-        elif length == 3 or length == 4:
-            self.encodeTagAndAdditional(tag, Tag_Minor_length4)
-            self.buf.append((value >> 24) & 0xff)
-            self.buf.append((value >> 16) & 0xff)
-            self.buf.append((value >> 8) & 0xff)
-            self.buf.append(value & 0xff)
-
-        elif length == 2:
-            self.encodeTagAndAdditional(tag, Tag_Minor_length2)
-            self.buf.append((value >> 8) & 0xff)
-            self.buf.append(value & 0xff)
-
-        elif length == 1:
-            self.encodeTagAndAdditional(tag, Tag_Minor_length1)
-            self.buf.append(value & 0xff)
-
-        elif length == 0:
+        if length == 0:
             self.encodeTagAndAdditional(tag, value)
-
         else:
-            raise Exception("Unsupported byte length of {} for value in encodeTagAndValue()".format(length))
+            (minor, value_struct) = get_value_struct(length)
+            self.encodeTagAndAdditional(tag, minor)
+            self.buf += value_struct.pack(value)
 
         encoded_size = 1 + length
         return encoded_size
@@ -162,9 +177,31 @@ class CBOREncoder:
         return self.encodeTagAndValue(Tag_Major_map, value)
 
 
+# Decodes the value of the item at `pos` in the memoryview `buf`, which must
+# have the major tag `tag`. Returns (value, position after the value).
+def decode_value(buf, pos, tag):
+    if pos >= len(buf):
+        raise Exception("Not enough input")
+    octet = buf[pos]
+    if octet & Tag_Major_mask != tag:
+        raise Exception("Expected tag {}, but found {}".format(tag, octet & Tag_Major_mask))
+
+    additional = octet & Tag_Minor_mask
+    if additional < Tag_Minor_length1:
+        return (additional, pos + 1)
+
+    value_struct = Value_Structs.get(additional)
+    if value_struct == None:
+        raise Exception("Bad additional value")
+    if len(buf) - pos - 1 < value_struct.size:
+        raise Exception("Not enough input")
+    return (value_struct.unpack_from(buf, pos + 1)[0], pos + 1 + value_struct.size)
+
 class CBORDecoder:
+    # Works over a memoryview of the input, byte strings are returned as views
+    # into it rather than copies
     def __init__(self, buf):
-        self.buf = buf
+        self.buf = memoryview(buf)
         self.pos = 0
 
     def decodeTagAndAdditional(self, flags=Flag_None):
@@ -187,44 +224,17 @@ class CBORDecoder:
             value = additional
             return (tag, value, length)
 
-        value = 0
-        if additional == Tag_Minor_length8:
-            if end - self.pos < 8:
-                raise Exception("Not enough input")            
-            for shift in [56, 48, 40, 32, 24, 16, 8, 0]:
-                value |= self.buf[self.pos] << shift
-                self.pos += 1
-            if ((flags & Flag_Require_Minimal_Encoding) and value == 0):
-                raise Exception("Encoding not minimal")
-            return (tag, value, self.pos)
-        elif additional == Tag_Minor_length4:
-            if end - self.pos < 4:
-                raise Exception("Not enough input")            
-            for shift in [24, 16, 8, 0]:
-                value |= self.buf[self.pos] << shift
-                self.pos += 1
-            if ((flags & Flag_Require_Minimal_Encoding) and value == 0):
-                raise Exception("Encoding not minimal")
-            return (tag, value, self.pos)
-        elif additional == Tag_Minor_length2:
-            if end - self.pos < 2:
-                raise Exception("Not enough input")            
-            for shift in [8, 0]:
-                value |= self.buf[self.pos] << shift
-                self.pos += 1
-            if ((flags & Flag_Require_Minimal_Encoding) and value == 0):
-                raise Exception("Encoding not minimal")
-            return (tag, value, self.pos)
-        elif additional == Tag_Minor_length1:
-            if end - self.pos < 1:
-                raise Exception("Not enough input")            
-            value |= self.buf[self.pos]
-            self.pos += 1
-            if ((flags & Flag_Require_Minimal_Encoding) and value == 0):
-                raise Exception("Encoding not minimal")
-            return (tag, value, self.pos)
+        value_struct = Value_Structs.get(additional)
+        if value_struct == None:
+            raise Exception("Bad additional value")
 
-        raise Exception("Bad additional value")
+        if end - self.pos < value_struct.size:
+            raise Exception("Not enough input")
+        (value,) = value_struct.unpack_from(self.buf, self.pos)
+        self.pos += value_struct.size
+        if ((flags & Flag_Require_Minimal_Encoding) and value == 0):
+            raise Exception("Encoding not minimal")
+        return (tag, value, self.pos)
 
     def decodeUnsigned(self, flags=Flag_None):
         (tag, value, length) = self.decodeTagAndValue(flags)
@@ -265,7 +275,7 @@ class CBORDecoder:
         if end - self.pos < byte_length:
             raise Exception("Not enough input")
 
-        value = bytes(self.buf[self.pos : self.pos + byte_length])
+        value = self.buf[self.pos : self.pos + byte_length]
         self.pos += byte_length
         return (value, size_length + byte_length)
 
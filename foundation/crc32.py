@@ -7,30 +7,83 @@
 
 from .constants import MAX_UINT32
 
+try:
+    from zlib import crc32 as zlib_crc32
+except:
+    try:
+        from binascii import crc32 as zlib_crc32
+    except:
+        zlib_crc32 = None
+
 def bit_length(n):
     return len(bin(abs(n))) - 2
 
-TABLE = None
+# Slicing-by-8 tables: TABLES[0] is the classic byte-at-a-time table and
+# TABLES[k][i] is the CRC of byte `i` followed by `k` zero bytes.
+TABLES = None
 
-def crc32(buf):
-    # Lazily instantiate CRC table
-    global TABLE
-    if TABLE == None:
-        TABLE = [None] * (256 * 4)
+def make_tables():
+    table = [0] * 256
+    for i in range(256):
+        c = i
+        for j in range(8):
+            c = (c >> 1) if (c % 2 == 0) else (0xEDB88320 ^ (c >> 1))
+
+        table[i] = c
+
+    tables = [table]
+    for k in range(1, 8):
+        prev = tables[k - 1]
+        tables.append([(prev[i] >> 8) ^ table[prev[i] & 0xFF] for i in range(256)])
+
+    return tables
+
+def crc32_update_table(crc, buf):
+    # Lazily instantiate CRC tables
+    global TABLES
+    if TABLES == None:
+        TABLES = make_tables()
 
-        for i in range(256):
-            c = i
-            for j in range(8):
-                c = (c >> 1) if (c % 2 == 0) else (0xEDB88320 ^ (c >> 1))
+    (t0, t1, t2, t3, t4, t5, t6, t7) = TABLES
 
-            TABLE[i] = c
+    crc = MAX_UINT32 & ~crc
+    buf = memoryview(buf).cast('B')
+    count = len(buf)
+    end = count - (count % 8)
+    for i in range(0, end, 8):
+        one = crc ^ int.from_bytes(buf[i:i + 4], 'little')
+        two = int.from_bytes(buf[i + 4:i + 8], 'little')
+        crc = (t7[one & 0xFF] ^ t6[(one >> 8) & 0xFF] ^ t5[(one >> 16) & 0xFF] ^ t4[one >> 24] ^
+               t3[two & 0xFF] ^ t2[(two >> 8) & 0xFF] ^ t1[(two >> 16) & 0xFF] ^ t0[two >> 24])
 
-    crc = MAX_UINT32 & ~0
-    for byte in buf:
-        crc = (crc >> 8) ^ TABLE[(crc ^ byte) & 0xFF]
+    for i in range(end, count):
+        crc = (crc >> 8) ^ t0[(crc ^ buf[i]) & 0xFF]
 
     return MAX_UINT32 & ~crc
 
+# Continue the checksum `crc` (as returned by a previous call) over `buf`
+def crc32_update(crc, buf):
+    if zlib_crc32 != None:
+        return zlib_crc32(buf, crc) & MAX_UINT32
+    return crc32_update_table(crc, buf)
+
+def crc32(buf):
+    return crc32_update(0, buf)
+
 def crc32n(buf):
     n = crc32(buf)
     return n.to_bytes(4, 'big')
+
+# Incremental checksum, for when the data arrives in pieces
+class CRC32:
+    def __init__(self, buf=None):
+        self.value = 0
+        if buf != None:
+            self.update(buf)
+
+    def update(self, buf):
+        self.value = crc32_update(self.value, buf)
+        return self
+
+    def digest(self):
+        return self.value.to_bytes(4, 'big')
@@ -5,8 +5,9 @@
 # Licensed under the "BSD-2-Clause Plus Patent License"
 #
 
-from .fountain_utils import choose_fragments, contains, is_strict_subset, set_difference
-from .utils import join_lists, join_bytes, crc32_int, xor_with, take_first
+from .fountain_utils import fragment_chooser, contains, is_strict_subset, set_difference
+from .crc32 import CRC32
+from .utils import join_lists, join_bytes, crc32_int, take_first, bytes_to_int, int_to_data
 
 class InvalidPart(Exception):
     pass
@@ -14,21 +15,35 @@ class InvalidPart(Exception):
 class InvalidChecksum(Exception):
     pass
 
+# Decoding engines
+#
+# `peeling` is the reference BC-UR algorithm: simple parts are used to reduce
+# mixed parts until they become simple themselves.
+#
+# `gaussian` keeps each part's fragment set as an integer bitmask and runs
+# incremental Gaussian elimination over GF(2). It completes as soon as the
+# received parts have full rank, which can take fewer parts than peeling.
+Engine_Peeling = 'peeling'
+Engine_Gaussian = 'gaussian'
+
 class FountainDecoder:
     class Part:
-        def __init__(self, indexes, data):
+        def __init__(self, indexes, value, data_len):
             self.indexes = frozenset(indexes)
-            self.data = data
-        
+            # The data is kept as a big integer so that reducing is a single XOR
+            self.value = value
+            self.data_len = data_len
+
         @classmethod
-        def from_encoder_part(cls, p):
-            return cls(choose_fragments(p.seq_num, p.seq_len, p.checksum), p.data[:])
+        def from_encoder_part(cls, p, chooser):
+            return cls(chooser.choose(p.seq_num), bytes_to_int(p.data), len(p.data))
 
         def indexes(self):
             return self.indexes
 
+        @property
         def data(self):
-            return self.data
+            return int_to_data(self.value, self.data_len)
 
         def is_simple(self):
             return len(self.indexes) == 1
@@ -38,7 +53,10 @@ class FountainDecoder:
             return list(self.indexes)[0]
 
     # FountainDecoder
-    def __init__(self):
+    def __init__(self, engine=Engine_Peeling):
+        if engine not in (Engine_Peeling, Engine_Gaussian):
+            raise ValueError('Unknown decoding engine: {}'.format(engine))
+        self.engine = engine
         self.received_part_indexes = set()
         self.last_part_indexes = None
         self.processed_parts_count = 0
@@ -47,10 +65,18 @@ class FountainDecoder:
         self.expected_fragment_len = None
         self.expected_message_len = None
         self.expected_checksum = None
+        self.fragment_chooser = None
         self.simple_parts = {}
         self.mixed_parts = {}
         self.queued_parts = []
 
+        # Running message checksum over the contiguous prefix of simple parts
+        self.checksum = CRC32()
+        self.checksum_index = 0
+
+        # Gaussian engine state: pivot fragment index -> (mask, data as int)
+        self.pivot_rows = {}
+
     def expected_part_count(self):
         return len(self.expected_part_indexes)  # TODO: Handle None?
 
@@ -88,14 +114,17 @@ class FountainDecoder:
         if not self.validate_part(encoder_part):
             return False
 
-        # Add this part to the queue
-        p = FountainDecoder.Part.from_encoder_part(encoder_part)
-        self.last_part_indexes = p.indexes
-        self.enqueue(p)
+        if self.engine == Engine_Gaussian:
+            self.process_gaussian_part(encoder_part)
+        else:
+            # Add this part to the queue
+            p = FountainDecoder.Part.from_encoder_part(encoder_part, self.fragment_chooser)
+            self.last_part_indexes = p.indexes
+            self.enqueue(p)
 
-        # Process the queue until we're done or the queue is empty
-        while not self.is_complete() and len(self.queued_parts) != 0:
-            self.process_queue_item()
+            # Process the queue until we're done or the queue is empty
+            while not self.is_complete() and len(self.queued_parts) != 0:
+                self.process_queue_item()
 
         # Keep track of how many parts we've processed
         self.processed_parts_count += 1
@@ -148,8 +177,7 @@ class FountainDecoder:
             # The new fragments in the revised part are `a` - `b`.
             new_indexes = set_difference(a.indexes, b.indexes)
             # The new data in the revised part are `a` XOR `b`
-            new_data = xor_with(bytearray(a.data), b.data)
-            return self.Part(new_indexes, new_data)
+            return self.Part(new_indexes, a.value ^ b.value, a.data_len)
         else:
             # `a` is not reducable by `b`, so return a
             return a
@@ -163,6 +191,7 @@ class FountainDecoder:
         # Record this part
         self.simple_parts[p.indexes] = p
         self.received_part_indexes.add(fragment_index)
+        self.update_checksum()
 
         # If we've received all the parts
         if self.received_part_indexes == self.expected_part_indexes:
@@ -180,8 +209,7 @@ class FountainDecoder:
             message = self.join_fragments(fragments, self.expected_message_len)
 
             # Verify the message checksum and note success or failure
-            checksum = crc32_int(message)
-            if(checksum == self.expected_checksum):
+            if(self.checksum.value == self.expected_checksum):
                 self.result = bytes(message)
             else:
                 self.result = InvalidChecksum()
@@ -190,6 +218,22 @@ class FountainDecoder:
             # Reduce all the mixed parts by this part
             self.reduce_mixed_by(p)
 
+    def update_checksum(self):
+        # Fold simple parts into the message checksum as soon as every part
+        # before them has arrived, so that completing the message doesn't need
+        # another pass over all of it.
+        last_index = self.expected_part_count() - 1
+        while self.checksum_index <= last_index:
+            p = self.simple_parts.get(frozenset([self.checksum_index]))
+            if p == None:
+                break
+            data = p.data
+            if self.checksum_index == last_index:
+                # Throw away the padding of the last fragment
+                data = take_first(data, self.expected_message_len - last_index * self.expected_fragment_len)
+            self.checksum.update(data)
+            self.checksum_index += 1
+
     def process_mixed_part(self, p):
         # Don't process duplicate parts
         for r in self.mixed_parts.values():
@@ -214,6 +258,64 @@ class FountainDecoder:
             # Record this new mixed part
             self.mixed_parts[p2.indexes] = p2
 
+    def process_gaussian_part(self, encoder_part):
+        indexes = self.fragment_chooser.choose(encoder_part.seq_num)
+        self.last_part_indexes = indexes
+
+        mask = 0
+        for index in indexes:
+            mask |= 1 << index
+        data = bytes_to_int(encoder_part.data)
+
+        # Reduce the new row by the existing pivot rows. Every pivot row's lowest
+        # set bit is its pivot, so each step strictly raises the lowest set bit of
+        # `mask` and the loop ends on either a new pivot or an empty mask.
+        while mask:
+            low = mask & -mask
+            pivot = low.bit_length() - 1
+            row = self.pivot_rows.get(pivot)
+            if row is None:
+                break
+            mask ^= row[0]
+            data ^= row[1]
+
+        # Linearly dependent on what we already have (this includes duplicates)
+        if not mask:
+            return
+
+        self.pivot_rows[pivot] = (mask, data)
+        if mask == low:
+            self.received_part_indexes.add(pivot)
+
+        if len(self.pivot_rows) == self.expected_part_count():
+            self.solve_gaussian()
+
+    def solve_gaussian(self):
+        # Back-substitute from the highest pivot down. A pivot row only has bits
+        # at or above its pivot, so by the time we reach it every other fragment
+        # it mixes in has already been solved.
+        fragment_len = self.expected_fragment_len
+        solved = [0] * self.expected_part_count()
+        for pivot in reversed(range(len(solved))):
+            (mask, data) = self.pivot_rows[pivot]
+            mask ^= 1 << pivot
+            while mask:
+                low = mask & -mask
+                data ^= solved[low.bit_length() - 1]
+                mask ^= low
+            solved[pivot] = data
+            self.received_part_indexes.add(pivot)
+
+        fragments = [int_to_data(data, fragment_len) for data in solved]
+        message = self.join_fragments(fragments, self.expected_message_len)
+
+        # Verify the message checksum and note success or failure
+        checksum = crc32_int(message)
+        if(checksum == self.expected_checksum):
+            self.result = bytes(message)
+        else:
+            self.result = InvalidChecksum()
+
     def validate_part(self, p):
         # If this is the first part we've seen
         if self.expected_part_indexes == None:
@@ -225,6 +327,7 @@ class FountainDecoder:
             self.expected_message_len = p.message_len
             self.expected_checksum = p.checksum
             self.expected_fragment_len = len(p.data)
+            self.fragment_chooser = fragment_chooser(p.seq_len, p.checksum)
         else:
             # If this part's values don't match the first part's values, throw away the part
             if self.expected_part_count() != p.seq_len:
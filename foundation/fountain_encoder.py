@@ -6,10 +6,12 @@
 #
 
 import math
-from .cbor_lite import CBORDecoder, CBOREncoder
-from .fountain_utils import choose_fragments
-from .utils import split, crc32_int, xor_into, data_to_hex
-from .constants import MAX_UINT32, MAX_UINT64
+from functools import lru_cache
+from .cbor_lite import (decode_value, encode_value_into, get_encoded_size,
+                        Tag_Major_array, Tag_Major_unsignedInteger, Tag_Major_byteString)
+from .fountain_utils import fragment_chooser
+from .utils import split, crc32_int, data_to_hex, bytes_to_int, int_to_data
+from .constants import MAX_UINT32
 
 class InvalidHeader(Exception):
     pass
@@ -25,43 +27,33 @@ class Part:
 
     @staticmethod
     def from_cbor(cbor_buf):
+        # Fast path for the fixed [seq_num, seq_len, message_len, checksum, data]
+        # layout, `data` is a view into `cbor_buf`
         try:
-            decoder = CBORDecoder(cbor_buf)
-            (array_size, _) = decoder.decodeArraySize()
+            buf = memoryview(cbor_buf)
+            (array_size, pos) = decode_value(buf, 0, Tag_Major_array)
             if array_size != 5:
                 raise InvalidHeader()
-                        
-            (seq_num, _) = decoder.decodeUnsigned()
-            if seq_num > MAX_UINT64:  # TODO: Do something better with this check
-                raise InvalidHeader()
-            
-            (seq_len, _) = decoder.decodeUnsigned()
-            if seq_len > MAX_UINT64:
-                raise InvalidHeader()
-            
-            (message_len, _) = decoder.decodeUnsigned()
-            if message_len > MAX_UINT64:
-                raise InvalidHeader()
-            
-            (checksum, _) = decoder.decodeUnsigned()
-            if checksum > MAX_UINT64:
-                raise InvalidHeader()
 
-            (data, _) = decoder.decodeBytes()
+            (seq_num, pos) = decode_value(buf, pos, Tag_Major_unsignedInteger)
+            (seq_len, pos) = decode_value(buf, pos, Tag_Major_unsignedInteger)
+            (message_len, pos) = decode_value(buf, pos, Tag_Major_unsignedInteger)
+            (checksum, pos) = decode_value(buf, pos, Tag_Major_unsignedInteger)
+
+            (data_len, pos) = decode_value(buf, pos, Tag_Major_byteString)
+            if len(buf) - pos < data_len:
+                raise InvalidHeader()
+            data = buf[pos:pos + data_len]
 
             return Part(seq_num, seq_len, message_len, checksum, data)
         except Exception as err:
             raise InvalidHeader()
 
     def cbor(self):
-        encoder = CBOREncoder()
-        encoder.encodeArraySize(5)
-        encoder.encodeInteger(self.seq_num)
-        encoder.encodeInteger(self.seq_len)
-        encoder.encodeInteger(self.message_len)
-        encoder.encodeInteger(self.checksum)
-        encoder.encodeBytes(self.data)
-        return encoder.get_bytes()
+        buf = bytearray()
+        header = part_header(self.seq_len, self.message_len, self.checksum, len(self.data))
+        encode_part_into(buf, self.seq_num, header, self.data)
+        return buf
 
     def seq_num(self):
         return self.seq_num
@@ -82,6 +74,38 @@ class Part:
         return "seqNum:{}, seqLen:{}, messageLen:{}, checksum:{}, data:{}".format(
             self.seq_num, self.seq_len, self.message_len, self.checksum, data_to_hex(self.data))
 
+def part_cbor_size(seq_num, seq_len, message_len, checksum, data_len):
+    return (get_encoded_size(5) + get_encoded_size(seq_num) + get_encoded_size(seq_len) +
+            get_encoded_size(message_len) + get_encoded_size(checksum) + get_encoded_size(data_len) + data_len)
+
+# CBOR of the part fields after `seq_num`, up to the data bytes. It is the same
+# for every part of a message.
+@lru_cache(maxsize=16)
+def part_header(seq_len, message_len, checksum, data_len):
+    buf = bytearray(get_encoded_size(seq_len) + get_encoded_size(message_len) +
+                    get_encoded_size(checksum) + get_encoded_size(data_len))
+    pos = encode_value_into(buf, 0, Tag_Major_unsignedInteger, seq_len)
+    pos = encode_value_into(buf, pos, Tag_Major_unsignedInteger, message_len)
+    pos = encode_value_into(buf, pos, Tag_Major_unsignedInteger, checksum)
+    encode_value_into(buf, pos, Tag_Major_byteString, data_len)
+    return bytes(buf)
+
+# Writes the CBOR of a part, [seq_num, seq_len, message_len, checksum, data], at
+# the start of the bytearray `buf`, which is grown if it is too small, so that
+# the same buffer can be reused for every part. `header` is what part_header()
+# returns for the other fields. Returns the encoded size.
+def encode_part_into(buf, seq_num, header, data):
+    size = 1 + get_encoded_size(seq_num) + len(header) + len(data)
+    if len(buf) < size:
+        buf.extend(bytes(size - len(buf)))
+
+    buf[0] = Tag_Major_array + 5
+    pos = encode_value_into(buf, 1, Tag_Major_unsignedInteger, seq_num)
+    end = pos + len(header)
+    buf[pos:end] = header
+    buf[end:size] = data
+    return size
+
 class FountainEncoder:
     def __init__(self, message, max_fragment_len, first_seq_num = 0, min_fragment_len = 10):
         assert(len(message) <= MAX_UINT32)
@@ -89,7 +113,10 @@ class FountainEncoder:
         self.checksum = crc32_int(message)
         self.fragment_len = FountainEncoder.find_nominal_fragment_length(self.message_len, min_fragment_len, max_fragment_len)
         self.fragments = FountainEncoder.partition_message(message, self.fragment_len)
+        # Fragments as big integers so that mixing is a single XOR per fragment
+        self.fragment_values = [bytes_to_int(fragment) for fragment in self.fragments]
         self.seq_num = first_seq_num
+        self.fragment_chooser = fragment_chooser(self.seq_len(), self.checksum)
     
     @staticmethod
     def find_nominal_fragment_length(message_len, min_fragment_len, max_fragment_len):
@@ -140,13 +167,16 @@ class FountainEncoder:
     def next_part(self):
         self.seq_num += 1
         self.seq_num = self.seq_num % MAX_UINT32  # wrap at period 2^32
-        indexes = choose_fragments(self.seq_num, self.seq_len(), self.checksum)
-        mixed = self.mix(indexes)
-        data = bytes(mixed)
-        return Part(self.seq_num, self.seq_len(), self.message_len, self.checksum, data)
+        return self.part(self.seq_num)
+
+    # The part for any sequence number, without moving the encoder forward
+    def part(self, seq_num):
+        indexes = self.fragment_chooser.choose(seq_num)
+        data = self.mix(indexes)
+        return Part(seq_num, self.seq_len(), self.message_len, self.checksum, data)
 
     def mix(self, indexes):
-        result = [0] * self.fragment_len
+        result = 0
         for index in indexes:
-            xor_into(result, self.fragments[index])
-        return result
+            result ^= self.fragment_values[index]
+        return int_to_data(result, self.fragment_len)
@@ -5,6 +5,11 @@
 # Licensed under the "BSD-2-Clause Plus Patent License"
 #
 
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+
 from .random_sampler import RandomSampler
 from .utils import int_to_bytes
 from .xoshiro256 import Xoshiro256
@@ -20,12 +25,44 @@ def shuffled(items, rng):
 
     return result
 
-def choose_degree(seq_len, rng):
+# The first `count` items of `shuffled(list(range(length)), rng)`, drawing only
+# the `count` random numbers needed for them instead of shuffling everything.
+def shuffled_prefix(length, count, rng):
+    taken = []
+    result = []
+    for remaining in range(length, length - count, -1):
+        # `index` points into the items not taken yet, in ascending order.
+        # The item it refers to is `index` plus the number of taken items up
+        # to that item, found by bisecting until that number stops growing.
+        index = rng.next_int(0, remaining - 1)
+        skipped = 0
+        while True:
+            below = bisect_right(taken, index + skipped)
+            if below == skipped:
+                break
+            skipped = below
+        item = index + skipped
+        insort(taken, item)
+        result.append(item)
+
+    return result
+
+DEGREE_SAMPLER_CACHE_SIZE = 16
+FRAGMENT_CHOOSER_CACHE_SIZE = 8
+FRAGMENT_CACHE_SIZE = 4096
+
+# The sampler only depends on `seq_len`, so build it once per message size.
+# Hit and miss counters are available through `degree_sampler.cache_info()`.
+@lru_cache(maxsize=DEGREE_SAMPLER_CACHE_SIZE)
+def degree_sampler(seq_len):
     degree_probabilities = []
     for i in range(1, seq_len + 1):
         degree_probabilities.append(1.0 / i)
 
-    degree_chooser = RandomSampler(degree_probabilities)
+    return RandomSampler(degree_probabilities)
+
+def choose_degree(seq_len, rng):
+    degree_chooser = degree_sampler(seq_len)
     return degree_chooser.next(lambda: rng.next_double()) + 1
 
 def choose_fragments(seq_num, seq_len, checksum):
@@ -38,12 +75,45 @@ def choose_fragments(seq_num, seq_len, checksum):
         seed = int_to_bytes(seq_num) + int_to_bytes(checksum)
         rng = Xoshiro256.from_bytes(seed)
         degree = choose_degree(seq_len, rng)
-        indexes = []
+        return set(shuffled_prefix(seq_len, degree, rng))
+
+# Memoizes `choose_fragments` for the parts of one message, so that repeated
+# frames never recompute the same index set.
+class FragmentChooser:
+    def __init__(self, seq_len, checksum, max_size=FRAGMENT_CACHE_SIZE):
+        self.seq_len = seq_len
+        self.checksum = checksum
+        self.max_size = max_size
+        self.fragments = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def choose(self, seq_num):
+        with self.lock:
+            indexes = self.fragments.get(seq_num)
+            if indexes != None:
+                self.hits += 1
+                self.fragments.move_to_end(seq_num)
+                return indexes
+
+        indexes = frozenset(choose_fragments(seq_num, self.seq_len, self.checksum))
+
+        with self.lock:
+            self.misses += 1
+            self.fragments[seq_num] = indexes
+            if len(self.fragments) > self.max_size:
+                self.fragments.popitem(last=False)
+
+        return indexes
+
+    def cache_info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.fragments)}
 
-        for i in range(seq_len):
-            indexes.append(i)
-        shuffled_indexes = shuffled(indexes, rng)
-        return set(shuffled_indexes[0:degree])
+# Encoders and decoders working on the same message share one chooser
+@lru_cache(maxsize=FRAGMENT_CHOOSER_CACHE_SIZE)
+def fragment_chooser(seq_len, checksum):
+    return FragmentChooser(seq_len, checksum)
 
 def contains(set_or_list, el):
     return el in set_or_list
@@ -5,9 +5,11 @@
 # Licensed under the "BSD-2-Clause Plus Patent License"
 #
 
+from time import perf_counter_ns
+
 from .ur import UR
 from .fountain_encoder import FountainEncoder, Part as FountainEncoderPart
-from .fountain_decoder import FountainDecoder
+from .fountain_decoder import FountainDecoder, Engine_Peeling
 from .bytewords import *
 from .utils import drop_first, is_ur_type
 
@@ -27,10 +29,17 @@ class InvalidFragment(Exception):
     pass
 
 class URDecoder:
-    def __init__(self):
-        self.fountain_decoder = FountainDecoder()
+    # `latency`, when given, gets the time spent in each stage of
+    # receive_part() through its record(stage, ns) method
+    def __init__(self, engine=Engine_Peeling, latency=None):
+        self.fountain_decoder = FountainDecoder(engine)
+        self.latency = latency
         self.expected_type = None
         self.result = None
+        # Sequence components of the parts already processed, so that parts
+        # seen again are dropped before being decoded
+        self.seen_sequences = set()
+        self.duplicates_skipped = 0
 
     @staticmethod
     def decode(str):
@@ -86,6 +95,22 @@ class URDecoder:
         except:
             raise InvalidSequenceComponent()
 
+    # (seq_num, seq_len) of a multi-part UR, read from the sequence component
+    # alone without parsing the rest of the string. None if there isn't one.
+    @staticmethod
+    def peek_sequence_component(str):
+        start = str.find('/', 3)
+        end = str.find('/', start + 1)
+        if start < 0 or end < 0:
+            return None
+        dash = str.find('-', start + 1, end)
+        if dash < 0:
+            return None
+        try:
+            return (int(str[start + 1:dash]), int(str[dash + 1:end]))
+        except ValueError:
+            return None
+
     def validate_part(self, type):
         if self.expected_type == None:
             if not is_ur_type(type):
@@ -101,6 +126,11 @@ class URDecoder:
             if self.result != None:
                 return False
 
+            # Don't decode a part that was already processed
+            if URDecoder.peek_sequence_component(str) in self.seen_sequences:
+                self.duplicates_skipped += 1
+                return False
+
             # Don't continue if this part doesn't validate
             (type, components) = URDecoder.parse(str)
             if not self.validate_part(type):
@@ -119,15 +149,28 @@ class URDecoder:
             fragment = components[1]
 
             # Parse the sequence component and the fragment, and make sure they agree.
+            latency = self.latency
             (seq_num, seq_len) = URDecoder.parse_sequence_component(seq)
+            if latency:
+                start = perf_counter_ns()
             cbor = Bytewords.decode(Bytewords_Style_minimal, fragment)
+            if latency:
+                decoded = perf_counter_ns()
+                latency.record('bytewords', decoded - start)
             part = FountainEncoderPart.from_cbor(cbor)
+            if latency:
+                parsed = perf_counter_ns()
+                latency.record('cbor', parsed - decoded)
             if seq_num != part.seq_num or seq_len != part.seq_len:
                 return False
 
             # Process the part
-            if not self.fountain_decoder.receive_part(part):
+            received = self.fountain_decoder.receive_part(part)
+            if latency:
+                latency.record('fountain', perf_counter_ns() - parsed)
+            if not received:
                 return False
+            self.seen_sequences.add((seq_num, seq_len))
 
             if self.fountain_decoder.is_success():
                 self.result = UR(type, self.fountain_decoder.result_message())
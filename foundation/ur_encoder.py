@@ -5,7 +5,8 @@
 # Licensed under the "BSD-2-Clause Plus Patent License"
 #
 
-from .fountain_encoder import FountainEncoder
+from .constants import MAX_UINT32
+from .fountain_encoder import FountainEncoder, encode_part_into, part_cbor_size, part_header
 from .bytewords import *
 
 class UREncoder:
@@ -41,6 +42,38 @@ class UREncoder:
         else:
             return UREncoder.encode_part(self.ur.type, part)
 
+    # Encode `count` consecutive parts starting at sequence number `start`,
+    # without moving the encoder forward. Everything that is the same for
+    # all the parts of this message is only built once.
+    def parts(self, start, count):
+        if self.is_single_part():
+            return [UREncoder.encode(self.ur)] * count
+
+        fountain_encoder = self.fountain_encoder
+        seq_len = fountain_encoder.seq_len()
+
+        header = part_header(seq_len, fountain_encoder.message_len, fountain_encoder.checksum,
+                             fountain_encoder.fragment_len)
+
+        # Every part is encoded into the same buffer, sized for the largest
+        # sequence number
+        buf = bytearray(part_cbor_size(MAX_UINT32, seq_len, fountain_encoder.message_len,
+                                       fountain_encoder.checksum, fountain_encoder.fragment_len))
+        view = memoryview(buf)
+
+        result = []
+        for i in range(count):
+            seq_num = (start + i) % MAX_UINT32  # wrap at period 2^32
+            indexes = fountain_encoder.fragment_chooser.choose(seq_num)
+
+            size = encode_part_into(buf, seq_num, header, fountain_encoder.mix(indexes))
+
+            seq = '{}-{}'.format(seq_num, seq_len)
+            body = Bytewords.encode(Bytewords_Style_minimal, view[:size])
+            result.append(UREncoder.encode_ur([self.ur.type, seq, body]))
+
+        return result
+
     @staticmethod
     def encode_part(type, part):
         seq = '{}-{}'.format(part.seq_num, part.seq_len)
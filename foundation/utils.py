@@ -24,6 +24,9 @@ def int_to_bytes(n):
 def bytes_to_int(buf):
     return int.from_bytes(buf, 'big')
 
+def int_to_data(n, length):
+    return n.to_bytes(length, 'big')
+
 def string_to_bytes(s):
     return bytes(s, 'utf8')
 
@@ -55,7 +58,18 @@ def join_bytes(list_of_ba):
         out.extend(ba)
     return out
 
+# XOR two equal-length buffers as whole integers instead of byte by byte
+def xor_bytes(a, b):
+    count = len(a)
+    assert(count == len(b)) # Must be the same length
+    return int_to_data(bytes_to_int(a) ^ bytes_to_int(b), count)
+
 def xor_into(target, source):
+    if isinstance(target, bytearray):
+        target[:] = xor_bytes(target, source)
+        return
+
+    # Fallback for targets that are not byte buffers (e.g. lists of ints)
     count = len(target)
     assert(count == len(source)) # Must be the same length
     for i in range(count):
@@ -0,0 +1,109 @@
+import json
+import threading
+
+# Stages of the read pipeline, in order
+STAGES = ('capture', 'convert', 'zbar', 'bytewords', 'cbor', 'fountain')
+SHORT_NAMES = {'capture': 'cap', 'convert': 'cvt', 'zbar': 'zbar', 'bytewords': 'bw', 'cbor': 'cbor', 'fountain': 'ftn'}
+
+# Histogram buckets: 4 per power of two of nanoseconds, so a value is known
+# to within ~20%
+SUB_BUCKETS = 4
+BUCKETS = 64 * SUB_BUCKETS
+
+# Set by enable(), None while instrumentation is off
+RECORDER = None
+
+
+def bucket(ns: int) -> int:
+    if ns < SUB_BUCKETS:
+        return max(ns, 0)
+    shift = ns.bit_length() - 3
+    return shift * SUB_BUCKETS + (ns >> shift)
+
+
+def bucket_value(index: int) -> float:
+    # Middle of the bucket, in ns
+    if index < SUB_BUCKETS:
+        return index
+    shift, top = divmod(index, SUB_BUCKETS)
+    shift -= 1
+    top += SUB_BUCKETS
+    return ((top << shift) + ((top + 1) << shift)) / 2
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns: int):
+        self.counts[bucket(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0
+        rank = p / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bucket_value(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        # Durations in microseconds
+        return {
+            'count': self.count,
+            'mean_us': self.total / self.count / 1000 if self.count else 0,
+            'p50_us': self.percentile(50) / 1000,
+            'p90_us': self.percentile(90) / 1000,
+            'p99_us': self.percentile(99) / 1000,
+            'max_us': self.max / 1000,
+        }
+
+
+class LatencyRecorder:
+    # Per-stage durations of the read pipeline. Stages run on several
+    # threads (capture, decode pool, UI), hence the lock.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {stage: Histogram() for stage in STAGES}
+
+    def record(self, stage: str, ns: int):
+        with self.lock:
+            self.histograms[stage].record(ns)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {stage: Histogram() for stage in STAGES}
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+    def brief(self) -> str:
+        # Median of every stage that ran, for the status bar
+        summary = self.summary()
+        return 'p50 ms: ' + '  '.join(
+            f"{SHORT_NAMES[stage]} {summary[stage]['p50_us'] / 1000:.2f}"
+            for stage in STAGES if summary[stage]['count']
+        )
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def enable() -> LatencyRecorder:
+    global RECORDER
+    if RECORDER is None:
+        RECORDER = LatencyRecorder()
+    return RECORDER
@@ -0,0 +1,23 @@
+import importlib
+import time
+
+
+class LazyModule:
+    # Stands in for a module that is only imported the first time one of its
+    # attributes is used, so heavy dependencies don't slow down startup
+
+    def __init__(self, name):
+        self.__dict__['name'] = name
+        self.__dict__['module'] = None
+        self.__dict__['load_time'] = None
+
+    def load(self):
+        if self.module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self.name)
+            self.__dict__['load_time'] = time.perf_counter() - start
+            self.__dict__['module'] = module
+        return self.module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
@@ -0,0 +1,320 @@
+import re
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from dataclasses import dataclass, field
+
+import qr_type
+import latency
+
+from foundation.ur_decoder import URDecoder
+from foundation.ur_encoder import UREncoder
+from foundation.ur import UR
+
+from lazy import LazyModule
+
+urtypes_crypto = LazyModule('urtypes.crypto')
+urtypes_bytes = LazyModule('urtypes.bytes')
+embit_psbt = LazyModule('embit.psbt')
+
+MAX_LEN = 100
+
+SPECTER_PATTERN = re.compile(r'^p\d+of\d+\s', re.IGNORECASE)
+UR_PATTERN = re.compile(r'^UR:', re.IGNORECASE)
+
+# UR parts are encoded ahead of the display loop, this many at a time
+UR_BATCH_SIZE = 32
+
+PART_POOL = ThreadPoolExecutor(max_workers=1)
+
+
+def to_str(bin_):
+    return bin_.decode('utf-8')
+
+
+@dataclass
+class QRCode:
+    data: str = ''
+    total_sequences: int = 0
+    sequences_count: int = 0
+    is_completed: bool = False
+    qr_type = None
+
+    def append(self, data: str):
+        self.data_init(1)
+        self.data = data
+        self.sequences_count += 1
+        self.is_completed = True
+
+    def data_init(self, sequences: int):
+        self.total_sequences = sequences
+        self.sequences_count = 0
+
+
+@dataclass
+class MultiQRCode(QRCode):
+    data_stack: list = field(default_factory=list)
+    is_init: bool = False
+    current: int = 0
+    ur_parts: deque = field(default_factory=deque)
+    total_sequences = None
+    qr_type = None
+    data_type = None
+    decoder = None
+    encoder = None
+    ur_batch = None
+
+    def step(self):
+        if self.qr_type == qr_type.SPECTER:
+            self.total_sequences = len(self.data_stack)
+
+            return f"{self.current + 1}/{self.total_sequences}"
+
+        elif self.qr_type == qr_type.UR:
+            return f"{self.current + 1}/{self.total_sequences}"
+
+    def payload_size(self) -> int:
+        # Message bytes carried by the current part
+        if self.qr_type == qr_type.SPECTER:
+            return len(self.data_stack[self.current])
+
+        elif self.qr_type == qr_type.UR:
+            return self.encoder.fountain_encoder.fragment_len
+
+    def append(self, data: tuple):
+        if self.qr_type == qr_type.SPECTER:
+            self.append_specter(data)
+
+        elif self.qr_type == qr_type.UR:
+            self.append_ur(data)
+
+    def append_specter(self, data: tuple):
+        # print(f'MultiQRCode.append({data})')
+        sequence = data[0]
+        total_sequences = data[1]
+        data = data[2]
+
+        if not self.is_init:
+            self.data_init(total_sequences)
+            self.is_init = True
+
+        if not self.data_stack[sequence-1]:
+            self.data_stack[sequence-1] = data
+        else:
+            if data != self.data_stack[sequence-1]:
+                print(f"{data} != {self.data_stack[sequence-1]}")
+                raise ValueError('Same sequences have different data!')
+        self.check_complete_specter()
+
+    def append_ur(self, data: tuple):
+        if not self.decoder:
+            self.decoder = URDecoder(latency=latency.RECORDER)
+
+        self.decoder.receive_part(data)
+
+        if self.decoder.fountain_decoder.expected_part_indexes is not None:
+            self.total_sequences = self.decoder.expected_part_count()
+            self.sequences_count = self.decoder.processed_parts_count()
+
+        self.check_complete_ur()
+
+    def progress(self) -> float:
+        # Percentage of the data received so far
+        if self.qr_type == qr_type.UR:
+            return self.decoder.estimated_percent_complete() * 100 if self.decoder else 0
+
+        return self.sequences_count / self.total_sequences * 100
+
+    def data_init(self, sequences: int):
+        super().data_init(sequences)
+        self.data_stack = [None] * sequences
+
+    def check_complete_specter(self):
+        fill_sequences = 0
+        for i in self.data_stack:
+            if i:
+                fill_sequences += 1
+
+        self.sequences_count = fill_sequences
+
+        if fill_sequences == self.total_sequences:
+            self.is_completed = True
+            data = ''
+
+            for i in self.data_stack:
+                data += i
+            self.data = data
+
+    def check_complete_ur(self):
+        if self.decoder.is_complete():
+            if self.decoder.is_success():
+                self.is_completed = True
+                cbor = self.decoder.result_message().cbor
+                _type = self.decoder.result_message().type
+                #  XPub
+                if _type == 'crypto-account':
+                    self.data = urtypes_crypto.Account.from_cbor(cbor).output_descriptors[0].descriptor()
+                #  PSBT
+                elif _type == 'crypto-psbt':
+                    self.data = urtypes_crypto.PSBT.from_cbor(cbor).data
+                    if type(self.data) is bytes:
+                        self.data = embit_psbt.PSBT.parse(self.data).to_string()
+
+                #  Descriptor
+                elif _type == 'crypto-output':
+                    self.data = urtypes_crypto.Output.from_cbor(cbor).descriptor()
+                #  bytes
+                elif _type == 'bytes':
+                    print('bytes')
+                    self.data = urtypes_bytes.Bytes.from_cbor(cbor).data.decode('utf-8')
+
+                else:
+                    print(f"Type not yet implemented: {type}")
+                    return
+
+                print(f"{_type}:{self.data}")
+
+            else:
+                print("fail to complete UR parsing: ", end='')
+                print(self.decoder.result_error())
+
+    @staticmethod
+    def from_string(data, max=MAX_LEN, type=None, format=None):
+
+        if (max and len(data) > max) or format == 'UR':
+            out = MultiQRCode()
+            out.data = data
+            if format == 'UR':
+                out.qr_type = qr_type.UR
+            elif format == 'Specter':
+                out.qr_type = qr_type.SPECTER
+
+            if format == 'Specter':
+                while len(data) > max:
+                    sequence = data[:max]
+                    data = data[max:]
+                    out.data_stack.append(sequence)
+                if len(data):
+                    out.data_stack.append(data)
+
+                out.total_sequences = len(out.data_stack)
+                out.sequences_count = out.total_sequences
+                out.is_completed = True
+
+            elif format == 'UR':
+                _UR = None
+                if type == 'PSBT':
+                    out.data_type = 'crypto-psbt'
+                    data = embit_psbt.PSBT.from_string(data).serialize()
+                    _UR = urtypes_crypto.PSBT
+                elif type == 'Descriptor':
+                    out.data_type = 'bytes'
+                    _UR = urtypes_bytes.Bytes
+                elif type == 'Key':
+                    print("key")
+                    out.data_type = 'bytes'
+                    _UR = urtypes_bytes.Bytes
+                elif type == 'Bytes':
+                    out.data_type = 'bytes'
+                    _UR = urtypes_bytes.Bytes
+                else:
+                    return
+                if not max:
+                    max = 100000
+                ur = UR(out.data_type, _UR(data).to_cbor())
+                out.encoder = UREncoder(ur, max)
+                out.total_sequences = out.encoder.fountain_encoder.seq_len()
+
+        else:
+            out = QRCode()
+            out.data = data
+            out.data_init(1)
+
+        return out
+
+    def next(self) -> str:
+        if self.qr_type == qr_type.SPECTER:
+            self.current += 1
+            if self.current >= self.total_sequences:
+                self.current = 0
+
+            data = self.specter_part(self.current)
+            print(data)
+
+            return data
+
+        elif self.qr_type == qr_type.UR:
+            if not self.ur_parts:
+                self.fill_ur_parts()
+            seq_num, data = self.ur_parts.popleft()
+            self.current = seq_num - 1
+            print(data)
+            return data
+
+    def specter_part(self, index: int) -> str:
+        data = self.data_stack[index]
+
+        digit_a = index + 1
+        digit_b = self.total_sequences
+
+        return f"p{digit_a}of{digit_b} {data}"
+
+    def parts(self, count: int) -> list:
+        # The first `count` strings of the sequence, without moving the
+        # display position
+        if self.qr_type == qr_type.SPECTER:
+            return [self.specter_part(i % self.total_sequences) for i in range(count)]
+
+        elif self.qr_type == qr_type.UR:
+            return [part.upper() for part in self.encoder.parts(1, count)]
+
+    def fill_ur_parts(self):
+        # Parts are encoded a batch at a time on a worker thread, the next batch
+        # being prepared while the display loop goes through the current one
+        if self.ur_batch is None:
+            self.ur_batch = PART_POOL.submit(self.encode_ur_parts, self.encoder.fountain_encoder.seq_num + 1)
+        start, parts = self.ur_batch.result()
+        self.ur_batch = PART_POOL.submit(self.encode_ur_parts, start + len(parts))
+        self.ur_parts.extend(zip(range(start, start + len(parts)), parts))
+
+    def encode_ur_parts(self, start):
+        parts = self.encoder.parts(start, UR_BATCH_SIZE)
+        return start, [part.upper() for part in parts]
+
+
+def read_part(qr_data, data: str):
+    # Add one decoded QR string to what was read so far. Returns the QRCode or
+    # MultiQRCode holding it, which is a new one unless `data` continues a
+    # multipart sequence.
+
+    #  Multipart QR Code case
+
+    # specter format
+    if SPECTER_PATTERN.match(data):
+
+        if not qr_data:
+            qr_data = MultiQRCode()
+            qr_data.qr_type = qr_type.SPECTER
+
+        header = data.split(' ')[0][1:].split('of')
+        data = ' '.join(data.split(' ')[1:])
+
+        digit_a = header[0]
+        digit_b = header[1]
+
+        qr_data.append((int(digit_a), int(digit_b), data))
+
+    elif UR_PATTERN.match(data):
+
+        if not qr_data:
+            qr_data = MultiQRCode()
+            qr_data.qr_type = qr_type.UR
+
+        qr_data.append(data)
+
+    else:
+        qr_data = QRCode()
+        qr_data.append(data)
+
+    return qr_data
@@ -1,254 +1,239 @@
 import sys
 import os
-import re
+import time
 
-from dataclasses import dataclass, field
+# Timeline of the startup phases, reported with --profile-startup
+STARTUP_PROFILE = '--profile-startup' in sys.argv
+startup_phases = [('start', time.perf_counter())]
 
-from pathlib import Path
-
-from yaml import load, dump
-from yaml.loader import SafeLoader as Loader
-
-from PySide6.QtWidgets import QApplication, QMainWindow
-from PySide6.QtGui import QImage, QPixmap, QPalette, QColor
-from PySide6.QtCore import Qt, QFile, QThread, Signal
-from PySide6.QtUiTools import QUiLoader
-from PySide6.QtGui import QTextOption
-
-from PIL import ImageQt
-
-from pyzbar import pyzbar
 
-import qrcode
+# Per-stage timings of the read pipeline, shown in the status bar and written
+# to LATENCY_FILE at the end of every read with --profile-latency
+LATENCY_PROFILE = '--profile-latency' in sys.argv
+LATENCY_FILE = 'latency.json'
 
-import cv2
 
-import qr_type
-
-from foundation.ur_decoder import URDecoder
-from foundation.ur_encoder import UREncoder
-from foundation.ur import UR
+def startup_phase(name):
+    if STARTUP_PROFILE:
+        startup_phases.append((name, time.perf_counter()))
 
-from urtypes.crypto import PSBT as UR_PSBT
-from urtypes.crypto import Account, Output
-from urtypes.bytes import Bytes
 
-from embit.psbt import PSBT
+import threading
 
-MAX_LEN = 100
-QR_DELAY = 400
-FILL_COLOR = "#434343"
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-def to_str(bin_):
-    return bin_.decode('utf-8')
+from dataclasses import dataclass, field, replace
 
+from pathlib import Path
 
-@dataclass
-class QRCode:
-    data: str = ''
-    total_sequences: int = 0
-    sequences_count: int = 0
-    is_completed: bool = False
-    qr_type = None
+# Headless commands run before anything pulls in Qt or OpenCV
+if __name__ == '__main__' and len(sys.argv) > 1 and not sys.argv[1].startswith('-'):
+    import cli
+    if sys.argv[1] in cli.COMMANDS:
+        sys.exit(cli.main(sys.argv[1:]))
 
-    def append(self, data: str):
-        self.data_init(1)
-        self.data = data
-        self.sequences_count += 1
-        self.is_completed = True
+from config_store import ConfigStore
 
-    def data_init(self, sequences: int):
-        self.total_sequences = sequences
-        self.sequences_count = 0
+startup_phase('stdlib and yaml imports')
 
+from PySide6.QtWidgets import QApplication, QMainWindow
+from PySide6.QtGui import QImage, QPixmap, QPalette, QColor
+from PySide6.QtCore import Qt, QFile, QThread, QTimer, Signal
+from PySide6.QtUiTools import QUiLoader
+from PySide6.QtGui import QTextOption
 
-@dataclass
-class MultiQRCode(QRCode):
-    data_stack: list = field(default_factory=list)
-    is_init: bool = False
-    current: int = 0
-    total_sequences = None
-    qr_type = None
-    data_type = None
-    decoder = None
-    encoder = None
-
-    def step(self):
-        if self.qr_type == qr_type.SPECTER:
-            self.total_sequences = len(self.data_stack)
-
-            return f"{self.current + 1}/{self.total_sequences}"
-
-        elif self.qr_type == qr_type.UR:
-            return f"{self.current + 1}/{self.total_sequences}"
-
-    def append(self, data: tuple):
-        if self.qr_type == qr_type.SPECTER:
-            self.append_specter(data)
-
-        elif self.qr_type == qr_type.UR:
-            self.append_ur(data)
-
-    def append_specter(self, data: tuple):
-        # print(f'MultiQRCode.append({data})')
-        sequence = data[0]
-        total_sequences = data[1]
-        data = data[2]
-
-        if not self.is_init:
-            self.data_init(total_sequences)
-            self.is_init = True
-
-        if not self.data_stack[sequence-1]:
-            self.data_stack[sequence-1] = data
-        else:
-            if data != self.data_stack[sequence-1]:
-                print(f"{data} != {self.data_stack[sequence-1]}")
-                raise ValueError('Same sequences have different data!')
-        self.check_complete_specter()
-
-    def append_ur(self, data: tuple):
-        if not self.decoder:
-            self.decoder = URDecoder()
-
-        self.decoder.receive_part(data)
-
-        self.check_complete_ur()
-
-    def data_init(self, sequences: int):
-        super().data_init(sequences)
-        self.data_stack = [None] * sequences
-
-    def check_complete_specter(self):
-        fill_sequences = 0
-        for i in self.data_stack:
-            if i:
-                fill_sequences += 1
-
-        self.sequences_count = fill_sequences
-
-        if fill_sequences == self.total_sequences:
-            self.is_completed = True
-            data = ''
-
-            for i in self.data_stack:
-                data += i
-            self.data = data
-
-    def check_complete_ur(self):
-        if self.decoder.is_complete():
-            if self.decoder.is_success():
-                self.is_completed = True
-                cbor = self.decoder.result_message().cbor
-                _type = self.decoder.result_message().type
-                #  XPub
-                if _type == 'crypto-account':
-                    self.data = Account.from_cbor(cbor).output_descriptors[0].descriptor()
-                #  PSBT
-                elif _type == 'crypto-psbt':
-                    self.data = UR_PSBT.from_cbor(cbor).data
-                    if type(self.data) is bytes:
-                        self.data = PSBT.parse(self.data).to_string()
-
-                #  Descriptor
-                elif _type == 'crypto-output':
-                    self.data = Output.from_cbor(cbor).descriptor()
-                #  bytes
-                elif _type == 'bytes':
-                    print('bytes')
-                    self.data = Bytes.from_cbor(cbor).data.decode('utf-8')
-
-                else:
-                    print(f"Type not yet implemented: {type}")
-                    return
-
-                print(f"{_type}:{self.data}")
+startup_phase('PySide6 imports')
 
-            else:
-                print("fail to complete UR parsing: ", end='')
-                print(self.decoder.result_error())
+from lazy import LazyModule
 
-    @staticmethod
-    def from_string(data, max=MAX_LEN, type=None, format=None):
-
-        if (max and len(data) > max) or format == 'UR':
-            out = MultiQRCode()
-            out.data = data
-            if format == 'UR':
-                out.qr_type = qr_type.UR
-            elif format == 'Specter':
-                out.qr_type = qr_type.SPECTER
-
-            if format == 'Specter':
-                while len(data) > max:
-                    sequence = data[:max]
-                    data = data[max:]
-                    out.data_stack.append(sequence)
-                if len(data):
-                    out.data_stack.append(data)
-
-                out.total_sequences = len(out.data_stack)
-                out.sequences_count = out.total_sequences
-                out.is_completed = True
-
-            elif format == 'UR':
-                _UR = None
-                if type == 'PSBT':
-                    out.data_type = 'crypto-psbt'
-                    data = PSBT.from_string(data).serialize()
-                    _UR = UR_PSBT
-                elif type == 'Descriptor':
-                    out.data_type = 'bytes'
-                    _UR = Bytes
-                elif type == 'Key':
-                    print("key")
-                    out.data_type = 'bytes'
-                    _UR = Bytes
-                elif type == 'Bytes':
-                    out.data_type = 'bytes'
-                    _UR = Bytes
-                else:
-                    return
-                if not max:
-                    max = 100000
-                ur = UR(out.data_type, _UR(data).to_cbor())
-                out.encoder = UREncoder(ur, max)
-                out.total_sequences = out.encoder.fountain_encoder.seq_len()
+# Heavy dependencies are only imported once they are needed
+np = LazyModule('numpy')
+pyzbar = LazyModule('pyzbar.pyzbar')
+qrcode = LazyModule('qrcode')
+cv2 = LazyModule('cv2')
+LAZY_MODULES = (np, pyzbar, qrcode, cv2)
 
-        else:
-            out = QRCode()
-            out.data = data
-            out.data_init(1)
+import qr_type
+import latency
 
-        return out
+if LATENCY_PROFILE:
+    latency.enable()
 
-    def next(self) -> str:
-        if self.qr_type == qr_type.SPECTER:
-            self.current += 1
-            if self.current >= self.total_sequences:
-                self.current = 0
+from qr_data import QRCode, MultiQRCode, read_part, to_str
+from cameras import CameraRegistry, CaptureProfile, AutoTuner, open_capture, CODECS, COMMON_RESOLUTIONS, \
+    POLL_INTERVAL as CAMERA_POLL_INTERVAL
 
-            data = self.data_stack[self.current]
+startup_phase('application modules')
 
-            digit_a = self.current + 1
-            digit_b = self.total_sequences
+DEFAULT_FPS = 3
+# Highest frame rate offered for the Send tab animation
+MAX_FPS = 30
+IDLE_DELAY = 100
+FILL_COLOR = "#434343"
 
-            data = f"p{digit_a}of{digit_b} {data}"
-            print(data)
+# A frame is considered unchanged (and not decoded again) when no cell of its
+# downsampled grayscale signature moved by more than FRAME_DIFF_THRESHOLD
+FRAME_SIGNATURE_SIZE = (64, 48)
+FRAME_DIFF_THRESHOLD = 8
+STATS_INTERVAL = 1.0
+
+# The camera is read on its own thread into a small ring buffer, frames are
+# decoded on a pool of workers (zbar releases the GIL) and the preview is
+# refreshed at its own rate
+CAPTURE_BUFFER_SIZE = 2
+DECODE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+MAX_PENDING_DECODES = DECODE_WORKERS * 2
+PREVIEW_FPS = 30
+
+# Capture frame rates offered in the Read tab
+CAPTURE_FPS = (5, 10, 15, 30, 60)
+
+# Memory budget for pre-rendered QR frames kept by DisplayQR
+FRAME_CACHE_BUDGET = 64 * 1024 * 1024
+# QR module matrices kept by part string, for sequences that loop
+QR_MATRIX_CACHE_SIZE = 256
+# Every frame uses this mask: picking the best one means building the code
+# with all 8 masks and scoring them, and any mask reads fine
+QR_MASK_PATTERN = 0
+
+# Once a QR code was found, only a region around it (grown by this fraction of
+# its size on every side) is decoded until it is lost again
+ROI_PADDING = 0.5
 
-            return data
+@dataclass
+class ScanStats:
+    captured: int = 0
+    skipped: int = 0
+    decoded: int = 0
+    accepted: int = 0
+    since: float = field(default_factory=time.monotonic)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.since
+
+    def rates(self) -> dict:
+        elapsed = max(self.elapsed(), 1e-6)
+        return {
+            'captured': self.captured / elapsed,
+            'skipped': self.skipped / elapsed,
+            'decoded': self.decoded / elapsed,
+            'accepted': self.accepted / elapsed,
+        }
+
+
+def frame_signature(gray):
+    return cv2.resize(gray, FRAME_SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def is_same_frame(signature, last_signature) -> bool:
+    if last_signature is None:
+        return False
+    diff = cv2.absdiff(signature, last_signature)
+    return cv2.minMaxLoc(diff)[1] <= FRAME_DIFF_THRESHOLD
+
+
+def padded_roi(symbols, offset, shape):
+    # Bounding box of the decoded symbols in frame coordinates, padded and
+    # clamped to the frame: (x0, y0, x1, y1)
+    left = min(symbol.rect.left for symbol in symbols)
+    top = min(symbol.rect.top for symbol in symbols)
+    right = max(symbol.rect.left + symbol.rect.width for symbol in symbols)
+    bottom = max(symbol.rect.top + symbol.rect.height for symbol in symbols)
+
+    pad_x = int((right - left) * ROI_PADDING)
+    pad_y = int((bottom - top) * ROI_PADDING)
+    height, width = shape[:2]
+    return (
+        max(0, offset[0] + left - pad_x),
+        max(0, offset[1] + top - pad_y),
+        min(width, offset[0] + right + pad_x),
+        min(height, offset[1] + bottom + pad_y),
+    )
+
+
+def decode_frame(gray, roi=None, recorder=None):
+    if recorder:
+        start = time.perf_counter_ns()
+        result = decode_frame(gray, roi)
+        recorder.record('zbar', time.perf_counter_ns() - start)
+        return result
+
+    # zbar works on 8-bit grayscale: hand it the single channel frame (or a
+    # view of the region of interest) so it has nothing to convert
+    if roi:
+        x0, y0, x1, y1 = roi
+        symbols = pyzbar.decode(gray[y0:y1, x0:x1])
+        if symbols:
+            return symbols, padded_roi(symbols, (x0, y0), gray.shape)
+
+    # No region yet, or the code left it: scan the whole frame
+    symbols = pyzbar.decode(gray)
+    if symbols:
+        return symbols, padded_roi(symbols, (0, 0), gray.shape)
+    return symbols, None
+
+
+class FrameCapture(threading.Thread):
+    # Reads frames as fast as the camera delivers them. Only the newest frames
+    # are kept, so a slow consumer never works on a stale backlog.
+
+    def __init__(self, capture):
+        super().__init__(daemon=True)
+        self.capture = capture
+        self.frames = deque(maxlen=CAPTURE_BUFFER_SIZE)
+        self.frame_id = 0
+        self.condition = threading.Condition()
+        self.stop = False
+        self.size = None
 
-        elif self.qr_type == qr_type.UR:
-            self.current = self.encoder.fountain_encoder.seq_num
-            data = self.encoder.next_part().upper()
-            print(data)
-            return data
+    def run(self):
+        while not self.stop:
+            # Resolution changes are applied here, between two reads
+            if self.size:
+                width, height = self.size
+                self.size = None
+                self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+            recorder = latency.RECORDER
+            if recorder:
+                start = time.perf_counter_ns()
+            ret, frame = self.capture.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            if recorder:
+                recorder.record('capture', time.perf_counter_ns() - start)
+            with self.condition:
+                self.frame_id += 1
+                self.frames.append((self.frame_id, frame))
+                self.condition.notify_all()
+
+    def latest(self, after: int, timeout: float):
+        # Newest (frame_id, frame) captured after `after`, or None on timeout
+        with self.condition:
+            self.condition.wait_for(lambda: self.frame_id > after or self.stop, timeout)
+            if self.frames and self.frames[-1][0] > after:
+                return self.frames[-1]
+        return None
+
+    def resize(self, size):
+        self.size = size
+
+    def close(self):
+        self.stop = True
+        with self.condition:
+            self.condition.notify_all()
+        self.join()
 
 
 class ReadQR(QThread):
 
     data = Signal(object)
     video_stream = Signal(object)
+    stats = Signal(object)
 
     def __init__(self, parent):
         QThread.__init__(self)
@@ -257,103 +242,144 @@ class ReadQR(QThread):
         self.qr_data: QRCode | MultiQRCode = None
         self.capture = None
         self.end = False
+        self.scan_stats = ScanStats()
+        self.seen_parts = set()
 
     def run(self):
         self.qr_data: QRCode | MultiQRCode = None
+        self.scan_stats = ScanStats()
+        self.seen_parts = set()
+        last_signature = None
         # Initialize the camera
         camera_id = self.parent.get_camera_id()
 
         if camera_id is None:
             return
-        self.capture = cv2.VideoCapture(camera_id)
 
-        self.parent.ui.btn_start_read.setText('Stop')
-        while not self.end:
-            self.msleep(30)
+        profile = self.parent.get_capture_profile()
+        tuner = None
+        if profile.auto:
+            camera = self.parent.camera_registry.get(camera_id)
+            tuner = AutoTuner(camera.resolutions() if camera else COMMON_RESOLUTIONS)
+            profile = replace(profile, width=tuner.resolution()[0], height=tuner.resolution()[1])
+
+        # Timings are kept per read session
+        recorder = latency.RECORDER
+        if recorder:
+            recorder.reset()
+
+        self.capture = open_capture(camera_id, profile)
+        frames = FrameCapture(self.capture)
+        frames.start()
+        pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS)
+        pending = deque()
+        last_id = 0
+        last_preview = 0
+        roi = None
+        frame_shape = None
 
-            ret, frame = self.capture.read()
+        self.parent.ui.btn_start_read.setText('Stop')
+        try:
+            while not self.end:
+                item = frames.latest(last_id, timeout=0.03)
+
+                if item:
+                    frame_id, frame = item
+                    self.scan_stats.captured += frame_id - last_id
+                    last_id = frame_id
+
+                    now = time.monotonic()
+                    if now - last_preview >= 1 / PREVIEW_FPS:
+                        last_preview = now
+                        self.video_stream.emit(self.preview(frame))
+
+                    # Skip decoding when the animation still shows the same frame,
+                    # or when every decode worker is already busy
+                    if recorder:
+                        start = time.perf_counter_ns()
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    if recorder:
+                        recorder.record('convert', time.perf_counter_ns() - start)
+                    if gray.shape != frame_shape:
+                        # The resolution changed, the region is in old coordinates
+                        frame_shape = gray.shape
+                        roi = None
+                    signature = frame_signature(gray)
+                    if is_same_frame(signature, last_signature) or len(pending) >= MAX_PENDING_DECODES:
+                        self.scan_stats.skipped += 1
+                    else:
+                        last_signature = signature
+                        self.scan_stats.decoded += 1
+                        pending.append(pool.submit(decode_frame, gray, roi, recorder))
+
+                # Hand decoded parts over in the order their frames arrived
+                while pending and pending[0].done():
+                    data, roi = pending.popleft().result()
+                    if tuner:
+                        size = tuner.update(data, frame_shape[1], time.monotonic())
+                        if size:
+                            frames.resize(size)
+                    # A sender may tile several parts in one image, use them all
+                    for symbol in data:
+                        try:
+                            self.decode(to_str(symbol.data))
+                        except Exception as e:
+                            print(e)
+
+                if self.scan_stats.elapsed() >= STATS_INTERVAL:
+                    rates = self.scan_stats.rates()
+                    if frame_shape:
+                        rates['resolution'] = f"{frame_shape[1]}x{frame_shape[0]}"
+                    if recorder:
+                        rates['latency'] = recorder.brief()
+                    self.stats.emit(rates)
+                    self.scan_stats = ScanStats()
+
+                if self.qr_data:
+                    if self.qr_data.is_completed:
+                        self.video_stream.emit(None)
+                        self.data.emit(self.qr_data.data)
+                        if self.qr_data.qr_type is None:
+                            print(f"QRCode:{self.qr_data.data}")
+                        break
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            frames.close()
+            if recorder:
+                recorder.dump(LATENCY_FILE)
+                print(f"latency profile written to {LATENCY_FILE}", file=sys.stderr)
 
-            if ret:
-                # Convert the frame to RGB format
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-                # Create a QImage from the frame data
-                height, width, channel = frame.shape
-                image = QImage(frame.data, width, height, QImage.Format_RGB888)
-
-                # Create a QPixmap from the QImage
-                pixmap = QPixmap.fromImage(image)
-
-                # Scale the QPixmap to fit the label dimensions
-                scaled_pixmap = pixmap.scaled(self.parent.ui.video_in.size(), Qt.KeepAspectRatio)
-
-                # Set the pixmap to the label
-                self.video_stream.emit(scaled_pixmap)
-
-                data = pyzbar.decode(frame)
-                if data:
-                    try:
-                        self.decode(to_str(data[0].data))
-                    except Exception as e:
-                        print(e)
-
-            if self.qr_data:
-                if self.qr_data.is_completed:
-                    self.video_stream.emit(None)
-                    self.data.emit(self.qr_data.data)
-                    if self.qr_data.qr_type is None:
-                        print(f"QRCode:{self.qr_data.data}")
-                    break
         if self.end:
             self.video_stream.emit(None)
         return
 
-    def decode(self, data):
-
-        #  Multipart QR Code case
+    def preview(self, frame):
+        # Convert the frame to RGB format
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-        # specter format
-        if re.match(r'^p\d+of\d+\s', data, re.IGNORECASE):
+        # Create a QImage from the frame data
+        height, width, channel = frame.shape
+        image = QImage(frame.data, width, height, QImage.Format_RGB888)
 
-            if not self.qr_data:
-                self.qr_data = MultiQRCode()
-                self.qr_data.qr_type = qr_type.SPECTER
-
-            header = data.split(' ')[0][1:].split('of')
-            data = ' '.join(data.split(' ')[1:])
-
-            digit_a = header[0]
-            digit_b = header[1]
-
-            self.qr_data.append((int(digit_a), int(digit_b), data))
+        # Create a QPixmap from the QImage
+        pixmap = QPixmap.fromImage(image)
 
-            progress = round(self.qr_data.sequences_count / self.qr_data.total_sequences * 100)
-            self.parent.ui.read_progress.setValue(progress)
-            self.parent.ui.read_progress.setFormat(f"{self.qr_data.sequences_count}/{self.qr_data.total_sequences}")
-            self.parent.ui.read_progress.setVisible(True)
+        # Scale the QPixmap to fit the label dimensions
+        return pixmap.scaled(self.parent.ui.video_in.size(), Qt.KeepAspectRatio)
 
-        elif re.match(r'^UR:', data, re.IGNORECASE):
+    def decode(self, data):
 
-            if not self.qr_data:
-                self.qr_data = MultiQRCode()
-                self.qr_data.qr_type = qr_type.UR
+        if data not in self.seen_parts:
+            self.seen_parts.add(data)
+            self.scan_stats.accepted += 1
 
-            self.qr_data.append(data)
+        self.qr_data = read_part(self.qr_data, data)
 
-            progress = self.qr_data.decoder.estimated_percent_complete() * 100
-            self.qr_data.total_sequences = self.qr_data.decoder.expected_part_count()
-            self.qr_data.sequences_count = self.qr_data.decoder.processed_parts_count()
-            self.parent.ui.read_progress.setValue(progress)
+        if isinstance(self.qr_data, MultiQRCode) and self.qr_data.total_sequences:
+            self.parent.ui.read_progress.setValue(round(self.qr_data.progress()))
             self.parent.ui.read_progress.setFormat(f"{self.qr_data.sequences_count}/{self.qr_data.total_sequences}")
             self.parent.ui.read_progress.setVisible(True)
 
-
-        else:
-            self.qr_data = QRCode()
-            self.qr_data.append(data)
-
-
-
     def on_finnish(self):
         if self.capture:
             self.capture.release()
@@ -361,34 +387,126 @@ class ReadQR(QThread):
         self.parent.ui.read_progress.setVisible(False)
         self.parent.ui.read_progress.setFormat('')
         self.parent.ui.btn_start_read.setText('Start read')
+        self.parent.statusBar().clearMessage()
+
+
+def qr_version(data) -> int:
+    # Smallest QR version holding `data`
+    qr = qrcode.QRCode()
+    qr.add_data(data)
+    return qr.best_fit()
+
+
+@lru_cache(maxsize=QR_MATRIX_CACHE_SIZE)
+def qr_matrix(data, version):
+    # Module matrix (True is dark), quiet zone included. Raises
+    # DataOverflowError if `data` doesn't fit in `version`. The returned
+    # array is shared through the cache and must not be modified.
+    qr = qrcode.QRCode(version=version, mask_pattern=QR_MASK_PATTERN)
+    qr.add_data(data)
+    qr.make(fit=False)
+    return np.array(qr.get_matrix(), dtype=bool)
+
+
+def tile_matrices(matrices, grid):
+    # Tile the parts row by row in equally sized cells, each QR code keeps
+    # its own quiet zone so the reader can pick them apart
+    cell = max(matrix.shape[0] for matrix in matrices)
+    tiled = np.zeros((cell * grid, cell * grid), dtype=bool)
+    for i, matrix in enumerate(matrices):
+        n = matrix.shape[0]
+        y = (i // grid) * cell + (cell - n) // 2
+        x = (i % grid) * cell + (cell - n) // 2
+        tiled[y:y + n, x:x + n] = matrix
+    return tiled
+
+
+def matrix_to_qimage(matrix, size):
+    # Render at the exact target size with every module the same whole number
+    # of pixels wide, centered on a white background
+    width, height = size.width(), size.height()
+    n = matrix.shape[0]
+    scale = max(1, min(width, height) // n)
+
+    modules = np.where(matrix, 0, 255).astype(np.uint8)
+    modules = np.repeat(np.repeat(modules, scale, axis=0), scale, axis=1)
+
+    side = modules.shape[0]
+    width, height = max(width, side), max(height, side)
+    pixels = np.full((height, width), 255, dtype=np.uint8)
+    y = (height - side) // 2
+    x = (width - side) // 2
+    pixels[y:y + side, x:x + side] = modules
+
+    image = QImage(pixels.data, width, height, width, QImage.Format_Grayscale8)
+    # Detach from the numpy buffer before it goes away
+    return image.copy()
+
+
+class FrameCache:
+    # Rendered QPixmaps by key, evicting the least recently shown ones once
+    # their total size goes over the memory budget
+
+    def __init__(self, budget=FRAME_CACHE_BUDGET):
+        self.budget = budget
+        self.frames = OrderedDict()
+        self.size = 0
+
+    @staticmethod
+    def cost(pixmap) -> int:
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+
+    def get(self, key):
+        pixmap = self.frames.get(key)
+        if pixmap is not None:
+            self.frames.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        if key in self.frames:
+            self.size -= self.cost(self.frames.pop(key))
+        self.frames[key] = pixmap
+        self.size += self.cost(pixmap)
+        while self.size > self.budget and len(self.frames) > 1:
+            _, evicted = self.frames.popitem(last=False)
+            self.size -= self.cost(evicted)
+
+    def clear(self):
+        self.frames.clear()
+        self.size = 0
 
 
 class DisplayQR(QThread):
 
     video_stream = Signal(object)
+    # Highest frame rate the current data and grid can be rendered at
+    max_fps = Signal(int)
 
     def __init__(self, parent):
         QThread.__init__(self)
         self.parent = parent
         self.qr_data: QRCode | MultiQRCode = None
         self.stop = False
+        # Parts are shown as a grid x grid tile of QR codes
+        self.grid = 1
+        self.fps = DEFAULT_FPS
+        self.frame_cache = FrameCache()
+        # QR version used for the parts of the current data
+        self.version = None
 
     def run(self):
         self.stop = False
+        # New data, split size or grid: nothing rendered so far can be shown again
+        self.frame_cache.clear()
+        self.version = None
         if self.qr_data.total_sequences > 1 or self.qr_data.qr_type == qr_type.UR:
-            while not self.stop:
-                data = self.qr_data.next()
-
-                self.display_qr(data)
-                self.parent.ui.steps.setText(self.qr_data.step())
-                if self.qr_data.total_sequences == 1:
-                    break
-                if not self.stop:
-                    self.msleep(QR_DELAY)
-
             if self.qr_data.total_sequences == 1:
+                self.display_qr(self.qr_data.next())
+                self.parent.ui.steps.setText(self.qr_data.step())
                 while not self.stop:
-                    self.msleep(QR_DELAY)
+                    self.msleep(IDLE_DELAY)
+            else:
+                self.animate()
 
             self.parent.ui.steps.setText('')
 
@@ -396,29 +514,125 @@ class DisplayQR(QThread):
             data = self.qr_data.data
             self.display_qr(data)
             while not self.stop:
-                self.msleep(QR_DELAY)
+                self.msleep(IDLE_DELAY)
+
+    def next_frame(self):
+        count = self.grid * self.grid if self.grid > 1 else 1
+        parts = []
+        payload = 0
+        for _ in range(count):
+            parts.append(self.qr_data.next())
+            payload += self.qr_data.payload_size()
+        return self.frame_for(tuple(parts)), self.qr_data.step(), payload
+
+    def animate(self):
+        # Frames are due on a fixed cadence measured on the monotonic clock, so
+        # render time is absorbed by the wait instead of adding to it
+        shown = 0
+        shown_bytes = 0
+        fps = 0.0
+        rate = 0.0
+        # Frames are rendered on this thread, so rendering sets the highest
+        # frame rate that can be kept up
+        render_time = 0.0
+        max_fps = MAX_FPS
+        window_start = time.monotonic()
+        deadline = window_start
+        frame = self.next_frame()
+
+        while not self.stop:
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                self.msleep(int(delay * 1000))
+            if self.stop:
+                break
+
+            pixmap, step, payload = frame
+            self.video_stream.emit(pixmap)
+
+            now = time.monotonic()
+            shown += 1
+            shown_bytes += payload
+            if now - window_start >= STATS_INTERVAL:
+                fps = shown / (now - window_start)
+                rate = shown_bytes / (now - window_start)
+                sustained = max(1, min(MAX_FPS, int(shown / render_time))) if render_time else MAX_FPS
+                if sustained != max_fps:
+                    max_fps = sustained
+                    self.max_fps.emit(max_fps)
+                shown = 0
+                shown_bytes = 0
+                render_time = 0.0
+                window_start = now
+            self.parent.ui.steps.setText(f"{step}   {fps:.1f} fps   {rate:.0f} B/s")
+
+            # When running late, start again from now rather than rushing frames out
+            deadline = max(deadline + 1 / self.fps, now)
+
+            # Render the next frame while this one is on screen
+            frame = self.next_frame()
+            render_time += time.monotonic() - now
+
+        self.max_fps.emit(MAX_FPS)
 
     def display_qr(self, data):
+        self.display_parts((data,))
+
+    def display_parts(self, parts):
+        self.video_stream.emit(self.frame_for(parts))
+
+    def frame_for(self, parts):
+        size = self.parent.ui.video_out.size()
+
+        # Fountain parts never repeat, every other sequence loops forever
+        if self.qr_data.qr_type == qr_type.UR and self.qr_data.total_sequences > 1:
+            return self.render(parts, size)
+
+        key = (parts, size.width(), size.height())
+        pixmap = self.frame_cache.get(key)
+        if pixmap is None:
+            pixmap = self.render(parts, size)
+            self.frame_cache.put(key, pixmap)
+        return pixmap
+
+    def matrix(self, data):
+        # The parts of a sequence are about the same length, so the version
+        # fitted to the first one is kept, and only raised for a longer part
+        if self.version is None:
+            self.version = qr_version(data)
+        try:
+            return qr_matrix(data, self.version)
+        except qrcode.exceptions.DataOverflowError:
+            self.version = max(self.version, qr_version(data))
+            return qr_matrix(data, self.version)
+
+    def render(self, parts, size):
+        matrices = [self.matrix(data) for data in parts]
+        if len(matrices) == 1:
+            modules = matrices[0]
+        else:
+            modules = tile_matrices(matrices, self.grid)
 
-        qr = qrcode.QRCode()
-        qr.add_data(data)
-        qr.make(fit=False)
-        img = qr.make_image()
-        pil_image = img.convert("RGB")
-        qimage = ImageQt.ImageQt(pil_image)
-        qimage = qimage.convertToFormat(QImage.Format_RGB888)
-
-        # Create a QPixmap from the QImage
-        pixmap = QPixmap.fromImage(qimage)
-
-        scaled_pixmap = pixmap.scaled(self.parent.ui.video_out.size(), Qt.KeepAspectRatio)
-        self.video_stream.emit(scaled_pixmap)
+        return QPixmap.fromImage(matrix_to_qimage(modules, size))
 
     def on_stop(self):
         self.video_stream.emit(None)
         self.stop = True
 
 
+class ListCameras(QThread):
+
+    cameras = Signal(object)
+
+    def __init__(self, registry):
+        super().__init__()
+        self.registry = registry
+        self.full = False
+
+    def run(self):
+        self.cameras.emit(self.registry.refresh(self.full))
+
+
 class MainWindow(QMainWindow):
     stop_display = Signal()
 
@@ -431,12 +645,15 @@ class MainWindow(QMainWindow):
         ui_file.open(QFile.ReadOnly)
         self.ui = loader.load(ui_file, self)
         ui_file.close()
+        startup_phase('load form.ui')
         self.setWindowTitle("SeedQReader")
         self.setFixedSize(812,670)
 
         self.setCentralWidget(self.ui)
 
+        self.config_store = ConfigStore()
         self.load_config()
+        startup_phase('load config')
 
         self.ui.btn_start_read.clicked.connect(self.on_qr_read)
         self.ui.btn_generate.clicked.connect(self.on_btn_generate)
@@ -476,79 +693,168 @@ class MainWindow(QMainWindow):
 
         self.ui.combo_type.addItems(['Descriptor', 'PSBT', 'Key', 'Bytes'])
         self.ui.combo_type.hide()
+
+        self.ui.combo_grid.addItems(['1x1', '2x2', '3x3'])
+        self.ui.fps_spin.valueChanged.connect(self.on_fps_change)
+        # Frame rate picked by the user, the spin box can be capped below it
+        self.requested_fps = self.ui.fps_spin.value()
         self.data_type = None
 
         self.ui.btn_camera_update.clicked.connect(self.on_camera_update)
+        self.ui.combo_camera.currentIndexChanged.connect(self.on_camera_changed)
+
+        self.ui.combo_capture_fps.addItem('Default', 0)
+        for fps in CAPTURE_FPS:
+            self.ui.combo_capture_fps.addItem(f"{fps} fps", fps)
+        self.ui.combo_codec.addItem('Default', '')
+        for codec in CODECS:
+            self.ui.combo_codec.addItem(codec, codec)
+        self.ui.combo_resolution.currentIndexChanged.connect(self.on_capture_change)
+        self.ui.combo_capture_fps.currentIndexChanged.connect(self.on_capture_change)
+        self.ui.combo_codec.currentIndexChanged.connect(self.on_capture_change)
+        self.on_camera_changed()
+
+        # Opening cameras is slow, look for them once the window is up, then
+        # only probe cameras that get plugged in
+        self.camera_registry = CameraRegistry()
+        self.list_cameras = ListCameras(self.camera_registry)
+        self.list_cameras.cameras.connect(self.on_cameras_listed)
+        QTimer.singleShot(0, self.on_camera_update)
+
+        self.camera_poll = QTimer(self)
+        self.camera_poll.timeout.connect(self.on_camera_poll)
+        self.camera_poll.start(CAMERA_POLL_INTERVAL)
 
         self.on_slider_move()
-        self.on_camera_update()
 
         self.init_qr()
+        startup_phase('init widgets')
 
     def init_qr(self):
 
         self.read_qr = ReadQR(self)
         self.read_qr.video_stream.connect(self.upd_camera_stream)
         self.read_qr.data.connect(self.on_qr_data_read)
+        self.read_qr.stats.connect(self.on_scan_stats)
 
         self.display_qr = DisplayQR(self)
         self.display_qr.video_stream.connect(self.on_qr_display)
+        self.display_qr.max_fps.connect(self.on_max_fps)
         self.stop_display.connect(self.display_qr.on_stop)
 
     def load_config(self):
-
-        if not os.path.exists('config'):
-            f = open('config', 'w')
-            f.close()
-
-        with open('config', 'r') as f:
-            data = load(f, Loader=Loader)
-
-        if not data:
-            data = {}
-
-        self.config = data
+        self.config = self.config_store.load()
 
     def dump_config(self):
-        with open('config', 'w') as f:
-            dump(self.config, f)
-
-    @staticmethod
-    def list_available_cameras():
-        index = 0
-        available_cameras = []
-        while True:
-            cap = cv2.VideoCapture(index)
-            if cap.isOpened():
-                available_cameras.append(str(index))
-                cap.release()
-                index += 1
-            else:
-                if index > 20 and not available_cameras:
-                    break
-                elif available_cameras and (index - int(available_cameras[-1])) > 2:
-                    break
-                else:
-                    index += 1
-                    continue
-
-        return available_cameras
+        self.config_store.save()
 
     def get_camera_id(self) -> int | None:
-        try:
-            id = self.ui.combo_camera.currentText()
-            return int(id)
-        except :
-            return None
+        return self.ui.combo_camera.currentData()
+
+    def list_cameras_start(self, full):
+        if not self.list_cameras.isRunning():
+            self.list_cameras.full = full
+            self.list_cameras.start()
 
     def on_camera_update(self):
+        # Probing the camera being read from would fail, only look for new ones then
+        self.ui.btn_camera_update.setEnabled(False)
+        self.list_cameras_start(full=not self.read_qr.isRunning())
+
+    def on_camera_poll(self):
+        if not self.read_qr.isRunning() and self.camera_registry.changed():
+            self.list_cameras_start(full=False)
+
+    def current_camera(self):
+        index = self.get_camera_id()
+        return None if index is None else self.camera_registry.get(index)
+
+    def get_capture_profile(self) -> CaptureProfile:
+        profile = CaptureProfile(
+            fps=self.ui.combo_capture_fps.currentData() or 0,
+            codec=self.ui.combo_codec.currentData() or '',
+        )
+        resolution = self.ui.combo_resolution.currentText()
+        if resolution == 'Auto':
+            profile.auto = True
+        elif 'x' in resolution:
+            profile.width, profile.height = map(int, resolution.split('x'))
+        return profile
+
+    def set_capture_profile(self, profile: CaptureProfile):
+        widgets = (self.ui.combo_resolution, self.ui.combo_capture_fps, self.ui.combo_codec)
+        for widget in widgets:
+            widget.blockSignals(True)
+
+        if profile.auto:
+            resolution = 'Auto'
+        elif profile.width and profile.height:
+            resolution = f"{profile.width}x{profile.height}"
+        else:
+            resolution = 'Default'
+        if self.ui.combo_resolution.findText(resolution) < 0:
+            self.ui.combo_resolution.addItem(resolution)
+        self.ui.combo_resolution.setCurrentText(resolution)
+
+        if self.ui.combo_capture_fps.findData(profile.fps) < 0:
+            self.ui.combo_capture_fps.addItem(f"{profile.fps} fps", profile.fps)
+        self.ui.combo_capture_fps.setCurrentIndex(self.ui.combo_capture_fps.findData(profile.fps))
+
+        codec = self.ui.combo_codec.findData(profile.codec)
+        self.ui.combo_codec.setCurrentIndex(max(codec, 0))
+
+        for widget in widgets:
+            widget.blockSignals(False)
+
+    def on_camera_changed(self):
+        # Offer the resolutions of the selected camera and restore its profile
+        camera = self.current_camera()
+        resolutions = camera.resolutions() if camera else COMMON_RESOLUTIONS
+
+        self.ui.combo_resolution.blockSignals(True)
+        self.ui.combo_resolution.clear()
+        self.ui.combo_resolution.addItems(['Auto', 'Default'])
+        self.ui.combo_resolution.addItems([f"{width}x{height}" for width, height in resolutions])
+        self.ui.combo_resolution.blockSignals(False)
+
+        profiles = self.config.get('capture') or {}
+        self.set_capture_profile(CaptureProfile.from_dict(profiles.get(camera.key()) if camera else None))
+
+    def on_capture_change(self):
+        camera = self.current_camera()
+        if camera is None:
+            return
+
+        self.load_config()
+        self.config.setdefault('capture', {})[camera.key()] = self.get_capture_profile().to_dict()
+        self.dump_config()
+
+    def on_cameras_listed(self, cameras):
         last = self.get_camera_id()
 
-        cameras = self.list_available_cameras()
         self.ui.combo_camera.clear()
-        self.ui.combo_camera.addItems(cameras)
-        if last and str(last) in cameras:
-            self.ui.combo_type.setCurrentText(str(last))
+        for camera in cameras:
+            self.ui.combo_camera.addItem(camera.label(), camera.index)
+        if last is not None and self.ui.combo_camera.findData(last) >= 0:
+            self.ui.combo_camera.setCurrentIndex(self.ui.combo_camera.findData(last))
+        self.ui.btn_camera_update.setEnabled(True)
+
+        if STARTUP_PROFILE and startup_phases[-1][0] != 'cameras listed':
+            startup_phase('cameras listed')
+            print_startup_profile()
+
+    def on_fps_change(self):
+        self.requested_fps = self.ui.fps_spin.value()
+        self.display_qr.fps = self.requested_fps
+
+    def on_max_fps(self, fps):
+        # Show at most what can be rendered, and go back to the requested
+        # frame rate once the cap allows it again
+        self.ui.fps_spin.blockSignals(True)
+        self.ui.fps_spin.setMaximum(fps)
+        self.ui.fps_spin.setValue(min(self.requested_fps, fps))
+        self.ui.fps_spin.blockSignals(False)
+        self.display_qr.fps = self.ui.fps_spin.value()
 
     def on_format_change(self):
         self.format = self.ui.combo_format.currentText()
@@ -584,6 +890,13 @@ class MainWindow(QMainWindow):
         self.ui.data_in.setWordWrapMode(QTextOption.WrapAnywhere)
         self.ui.data_in.setPlainText(data)
 
+    def on_scan_stats(self, rates):
+        message = ("{resolution}  captured: {captured:.1f}/s  skipped: {skipped:.1f}/s  "
+                   "decoded: {decoded:.1f}/s  new parts: {accepted:.1f}/s").format(**{'resolution': '', **rates})
+        if 'latency' in rates:
+            message += '  |  ' + rates['latency']
+        self.statusBar().showMessage(message)
+
     def upd_camera_stream(self, frame):
         if frame is None:
             frame = QPixmap(self.ui.video_in.size())
@@ -610,6 +923,8 @@ class MainWindow(QMainWindow):
                 print("error creating MultiQRCode")
                 return
             self.display_qr.qr_data = qr
+            self.display_qr.grid = self.ui.combo_grid.currentIndex() + 1
+            self.display_qr.fps = self.ui.fps_spin.value()
             self.display_qr.start()
 
             self.ui.btn_generate.setText('Stop')
@@ -698,6 +1013,18 @@ class MainWindow(QMainWindow):
         self.dump_config()
 
 
+def print_startup_profile():
+    start = startup_phases[0][1]
+    last = start
+    print("startup profile (ms)            step    total", file=sys.stderr)
+    for name, stamp in startup_phases[1:]:
+        print(f"  {name:<26} {(stamp - last) * 1000:8.1f} {(stamp - start) * 1000:8.1f}", file=sys.stderr)
+        last = stamp
+    for module in LAZY_MODULES:
+        if module.load_time is not None:
+            print(f"  lazy import {module.name:<14} {module.load_time * 1000:8.1f}", file=sys.stderr)
+
+
 if __name__ == '__main__':
     # the QUiLoader object needs to be initialized BEFORE the QApplication - https://stackoverflow.com/a/78041695
     loader = QUiLoader()
@@ -722,7 +1049,16 @@ if __name__ == '__main__':
     palette.setColor(QPalette.HighlightedText, Qt.black)
     app.setPalette(palette)
 
+    startup_phase('QApplication')
+
     main_win = MainWindow(loader)
     main_win.show()
+    startup_phase('window shown')
+
+    QTimer.singleShot(0, lambda: startup_phase('event loop running'))
+
     app.exec()
 
+    # Write out a save still waiting for its debounce delay
+    main_win.config_store.flush()
+
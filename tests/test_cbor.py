@@ -0,0 +1,220 @@
+import random
+
+import pytest
+
+from foundation.cbor_lite import CBORDecoder, Tag_Major_array, Tag_Major_byteString, Tag_Major_unsignedInteger
+from foundation.fountain_encoder import InvalidHeader, Part
+
+SEED = 7
+CASES = 5000
+# Value widths after the initial byte, by minor tag
+WIDTHS = {24: 1, 25: 2, 26: 4, 27: 8}
+
+
+# The decoder as it was before struct and memoryviews: values are assembled
+# byte by byte and byte strings are copied
+class ReferenceCBORDecoder:
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+
+    def decodeTagAndAdditional(self):
+        if self.pos == len(self.buf):
+            raise Exception("Not enough input")
+        octet = self.buf[self.pos]
+        self.pos += 1
+        return (octet & 0xe0, octet & 0x1f, 1)
+
+    def decodeTagAndValue(self):
+        end = len(self.buf)
+
+        if self.pos == end:
+            raise Exception("Not enough input")
+
+        (tag, additional, length) = self.decodeTagAndAdditional()
+        if additional < 24:
+            return (tag, additional, length)
+
+        value = 0
+        if additional == 27:
+            shifts = [56, 48, 40, 32, 24, 16, 8, 0]
+        elif additional == 26:
+            shifts = [24, 16, 8, 0]
+        elif additional == 25:
+            shifts = [8, 0]
+        elif additional == 24:
+            shifts = [0]
+        else:
+            raise Exception("Bad additional value")
+
+        if end - self.pos < len(shifts):
+            raise Exception("Not enough input")
+        for shift in shifts:
+            value |= self.buf[self.pos] << shift
+            self.pos += 1
+        return (tag, value, self.pos)
+
+    def decodeUnsigned(self):
+        (tag, value, length) = self.decodeTagAndValue()
+        if tag != Tag_Major_unsignedInteger:
+            raise Exception("Expected Tag_Major_unsignedInteger")
+        return (value, length)
+
+    def decodeBytes(self):
+        (tag, byte_length, size_length) = self.decodeTagAndValue()
+        if tag != Tag_Major_byteString:
+            raise Exception("Not a byteString")
+
+        end = len(self.buf)
+        if end - self.pos < byte_length:
+            raise Exception("Not enough input")
+
+        value = bytes(self.buf[self.pos : self.pos + byte_length])
+        self.pos += byte_length
+        return (value, size_length + byte_length)
+
+    def decodeArraySize(self):
+        (tag, value, length) = self.decodeTagAndValue()
+        if tag != Tag_Major_array:
+            raise Exception("Expected Tag_Major_array")
+        return (value, length)
+
+
+# Part.from_cbor as it was, on top of the reference decoder
+def reference_part_from_cbor(cbor_buf):
+    try:
+        decoder = ReferenceCBORDecoder(cbor_buf)
+        (array_size, _) = decoder.decodeArraySize()
+        if array_size != 5:
+            raise InvalidHeader()
+
+        (seq_num, _) = decoder.decodeUnsigned()
+        (seq_len, _) = decoder.decodeUnsigned()
+        (message_len, _) = decoder.decodeUnsigned()
+        (checksum, _) = decoder.decodeUnsigned()
+        (data, _) = decoder.decodeBytes()
+
+        return (seq_num, seq_len, message_len, checksum, data)
+    except Exception:
+        raise InvalidHeader()
+
+
+def decode_part(decode, buf):
+    try:
+        part = decode(buf)
+    except InvalidHeader:
+        return InvalidHeader
+    if isinstance(part, Part):
+        part = (part.seq_num, part.seq_len, part.message_len, part.checksum, bytes(part.data))
+    return part
+
+
+def encode_head(rng, tag, value):
+    # Minimal encoding, or sometimes a wider one than needed
+    minors = [minor for (minor, width) in WIDTHS.items() if value < 1 << (8 * width)]
+    if value < 24 and rng.random() < 0.8:
+        return bytes([tag + value])
+    minor = minors[0] if rng.random() < 0.7 else rng.choice(minors)
+    return bytes([tag + minor]) + value.to_bytes(WIDTHS[minor], 'big')
+
+
+def random_value(rng):
+    return rng.choice([rng.randint(0, 23), rng.randint(0, 0xff), rng.randint(0, 0xffff),
+                       rng.randint(0, 0xffffffff), rng.randint(0, 0xffffffffffffffff)])
+
+
+def random_part(rng):
+    data = rng.randbytes(rng.randint(0, 300))
+    buf = bytearray(encode_head(rng, Tag_Major_array, 5))
+    for _ in range(4):
+        buf += encode_head(rng, Tag_Major_unsignedInteger, random_value(rng))
+    buf += encode_head(rng, Tag_Major_byteString, len(data))
+    return buf + data
+
+
+def mutate(rng, buf):
+    buf = bytearray(buf)
+    kind = rng.randrange(5)
+    # Most CBOR headers are in the first 40 bytes
+    header = min(len(buf), 40)
+    if kind == 0 and header:
+        buf[rng.randrange(header)] = rng.randrange(256)
+    elif kind == 1 and header:
+        buf[rng.randrange(header)] ^= 1 << rng.randrange(8)
+    elif kind == 2:
+        del buf[rng.randint(0, len(buf)):]
+    elif kind == 3:
+        pos = rng.randint(0, header)
+        buf[pos:pos] = rng.randbytes(rng.randint(1, 9))
+    elif kind == 4 and header:
+        pos = rng.randrange(header)
+        del buf[pos:pos + rng.randint(1, 9)]
+    return buf
+
+
+def test_valid_parts_match():
+    rng = random.Random(SEED)
+    for _ in range(CASES):
+        buf = random_part(rng)
+        expected = decode_part(reference_part_from_cbor, buf)
+        assert expected is not InvalidHeader
+        assert decode_part(Part.from_cbor, buf) == expected
+        assert decode_part(Part.from_cbor, bytes(buf)) == expected
+
+
+def test_encoded_parts_round_trip():
+    rng = random.Random(SEED + 1)
+    for _ in range(CASES):
+        part = Part(random_value(rng) & 0xffffffff, rng.randint(1, 0xffffffff), random_value(rng),
+                    rng.randint(0, 0xffffffff), rng.randbytes(rng.randint(0, 300)))
+        buf = part.cbor()
+        expected = (part.seq_num, part.seq_len, part.message_len, part.checksum, part.data)
+        assert decode_part(reference_part_from_cbor, buf) == expected
+        assert decode_part(Part.from_cbor, buf) == expected
+
+
+def test_mutated_headers_match():
+    rng = random.Random(SEED + 2)
+    invalid = 0
+    for _ in range(CASES * 4):
+        buf = random_part(rng)
+        for _ in range(rng.randint(1, 3)):
+            buf = mutate(rng, buf)
+        expected = decode_part(reference_part_from_cbor, buf)
+        invalid += expected is InvalidHeader
+        assert decode_part(Part.from_cbor, buf) == expected, bytes(buf[:40]).hex()
+
+    # The mutations must exercise both outcomes
+    assert 0 < invalid < CASES * 4
+
+
+def test_random_bytes_match():
+    rng = random.Random(SEED + 3)
+    for _ in range(CASES):
+        buf = rng.randbytes(rng.randint(0, 40))
+        assert decode_part(Part.from_cbor, buf) == decode_part(reference_part_from_cbor, buf)
+
+
+@pytest.mark.parametrize('calls', [
+    ['decodeArraySize', 'decodeUnsigned', 'decodeUnsigned', 'decodeUnsigned', 'decodeUnsigned', 'decodeBytes'],
+    ['decodeUnsigned', 'decodeBytes', 'decodeBytes'],
+])
+def test_decoder_matches(calls):
+    rng = random.Random(SEED + 4)
+    for _ in range(CASES):
+        buf = mutate(rng, random_part(rng))
+        decoder = CBORDecoder(buf)
+        reference = ReferenceCBORDecoder(buf)
+        for call in calls:
+            try:
+                expected = getattr(reference, call)()
+            except Exception:
+                with pytest.raises(Exception):
+                    getattr(decoder, call)()
+                break
+
+            (value, length) = getattr(decoder, call)()
+            if call == 'decodeBytes':
+                value = bytes(value)
+            assert (value, length) == expected
+            assert decoder.pos == reference.pos
@@ -0,0 +1,96 @@
+import random
+import zlib
+
+import pytest
+
+from foundation import crc32 as crc32_module
+from foundation.crc32 import CRC32, crc32, crc32n, crc32_update, crc32_update_table
+
+SEED = 3
+# Lengths around the 8-byte blocks of slicing-by-8, plus some larger buffers
+LENGTHS = list(range(0, 33)) + [63, 64, 65, 255, 1000, 4096, 10007]
+
+MAX_UINT32 = 0xffffffff
+
+
+# crc32 as it was before zlib and slicing-by-8: one table lookup per byte
+REFERENCE_TABLE = None
+
+def reference_crc32(buf):
+    global REFERENCE_TABLE
+    if REFERENCE_TABLE == None:
+        REFERENCE_TABLE = [None] * (256 * 4)
+
+        for i in range(256):
+            c = i
+            for j in range(8):
+                c = (c >> 1) if (c % 2 == 0) else (0xEDB88320 ^ (c >> 1))
+
+            REFERENCE_TABLE[i] = c
+
+    crc = MAX_UINT32 & ~0
+    for byte in buf:
+        crc = (crc >> 8) ^ REFERENCE_TABLE[(crc ^ byte) & 0xFF]
+
+    return MAX_UINT32 & ~crc
+
+
+def random_buffers(count=200):
+    rng = random.Random(SEED)
+    for length in LENGTHS:
+        yield rng.randbytes(length)
+    for _ in range(count):
+        yield rng.randbytes(rng.randint(0, 2000))
+
+
+@pytest.fixture(params=['zlib', 'table'])
+def path(request, monkeypatch):
+    if request.param == 'zlib':
+        assert crc32_module.zlib_crc32 is not None
+    else:
+        # Force the pure-Python slicing-by-8 fallback
+        monkeypatch.setattr(crc32_module, 'zlib_crc32', None)
+    return request.param
+
+
+def test_matches_reference(path):
+    for buf in random_buffers():
+        expected = reference_crc32(buf)
+        assert crc32(buf) == expected
+        assert crc32n(buf) == expected.to_bytes(4, 'big')
+
+
+def test_table_matches_reference():
+    for buf in random_buffers():
+        assert crc32_update_table(0, buf) == reference_crc32(buf)
+
+
+def test_table_continues_zlib_checksum():
+    rng = random.Random(SEED)
+    for buf in random_buffers():
+        crc = rng.randint(0, MAX_UINT32)
+        assert crc32_update_table(crc, buf) == zlib.crc32(buf, crc)
+
+
+def test_table_accepts_views():
+    buf = bytearray(random.Random(SEED).randbytes(100))
+    view = memoryview(buf)[3:97]
+    assert crc32_update_table(0, view) == reference_crc32(view)
+
+
+def test_chained_updates_match_reference(path):
+    rng = random.Random(SEED)
+    for buf in random_buffers(50):
+        expected = reference_crc32(buf)
+
+        checksum = CRC32()
+        pos = 0
+        while pos < len(buf):
+            end = pos + rng.randint(0, 40)
+            checksum.update(buf[pos:end])
+            pos = end
+
+        assert checksum.value == expected
+        assert checksum.digest() == expected.to_bytes(4, 'big')
+        assert CRC32(buf).value == expected
+        assert crc32_update(crc32(buf[:7]), buf[7:]) == expected
@@ -0,0 +1,113 @@
+import random
+
+import pytest
+
+from foundation.fountain_decoder import FountainDecoder, Engine_Peeling, Engine_Gaussian
+from foundation.fountain_encoder import FountainEncoder
+from foundation.fountain_utils import fragment_chooser
+from foundation.ur import UR
+from foundation.ur_decoder import URDecoder
+from foundation.ur_encoder import UREncoder
+
+SEED = 11
+PAYLOAD_SIZES = [50, 1000, 5000]
+FRAGMENT_SIZES = [30, 100]
+STREAMS = ['in-order', 'shuffled', 'lossy-30', 'lossy-50', 'duplicates', 'missing-one']
+# Parts fed at most before giving up on a stream
+MAX_PARTS = 5000
+
+
+def stream_parts(kind, encoder, seq_len, rng):
+    # (seq_num, part string) pairs in the order a reader would see them
+    parts = ((seq_num, encoder.next_part()) for seq_num in range(1, MAX_PARTS + 1))
+
+    if kind == 'shuffled':
+        window = [next(parts) for _ in range(seq_len * 2)]
+        rng.shuffle(window)
+        yield from window
+
+    for (seq_num, part) in parts:
+        if kind.startswith('lossy') and rng.random() < int(kind.split('-')[1]) / 100:
+            continue
+        # Every simple part but the last: the mixed parts that don't cover
+        # it are dependent rows
+        if kind == 'missing-one' and seq_num == seq_len:
+            continue
+        for _ in range(rng.randint(1, 5) if kind == 'duplicates' else 1):
+            yield (seq_num, part)
+
+
+def decode_stream(engine, kind, ur, fragment_len):
+    encoder = UREncoder(ur, fragment_len)
+    seq_len = encoder.fountain_encoder.seq_len()
+    decoder = URDecoder(engine)
+    fed = []
+    for (seq_num, part) in stream_parts(kind, encoder, seq_len, random.Random(SEED)):
+        decoder.receive_part(part)
+        fed.append(seq_num)
+        if decoder.is_complete():
+            break
+    return decoder, fed
+
+
+@pytest.mark.parametrize('kind', STREAMS)
+@pytest.mark.parametrize('fragment_len', FRAGMENT_SIZES)
+@pytest.mark.parametrize('size', PAYLOAD_SIZES)
+def test_engines_agree(size, fragment_len, kind):
+    ur = UR('bytes', bytearray(random.Random(size).randbytes(size)))
+
+    (peeling, peeling_fed) = decode_stream(Engine_Peeling, kind, ur, fragment_len)
+    (gaussian, gaussian_fed) = decode_stream(Engine_Gaussian, kind, ur, fragment_len)
+
+    assert peeling.is_complete() and gaussian.is_complete()
+    assert peeling.is_success() and gaussian.is_success()
+    assert gaussian.result_message().type == peeling.result_message().type == ur.type
+    assert gaussian.result_message().cbor == peeling.result_message().cbor == ur.cbor
+    # Both see the same stream, Gaussian elimination stops at full rank
+    assert gaussian_fed == peeling_fed[:len(gaussian_fed)]
+    assert len(gaussian_fed) <= len(peeling_fed)
+
+
+def test_missing_one_has_dependent_rows():
+    # Make sure the stream above does feed dependent rows to the engines
+    ur = UR('bytes', bytearray(random.Random(1000).randbytes(1000)))
+    encoder = UREncoder(ur, 30)
+    seq_len = encoder.fountain_encoder.seq_len()
+    chooser = fragment_chooser(seq_len, encoder.fountain_encoder.checksum)
+    (_, fed) = decode_stream(Engine_Gaussian, 'missing-one', ur, 30)
+
+    mixed = [seq_num for seq_num in fed if seq_num > seq_len]
+    dependent = [seq_num for seq_num in mixed if seq_len - 1 not in chooser.choose(seq_num)]
+    assert dependent and len(dependent) < len(mixed)
+
+
+def decode_fountain_parts(engine, parts, rng):
+    # Returns the decoder and how many distinct parts it needed
+    decoder = FountainDecoder(engine)
+    for (used, part) in enumerate(parts, 1):
+        for _ in range(rng.randint(1, 4) if rng else 1):
+            decoder.receive_part(part)
+        if decoder.is_complete():
+            break
+    return decoder, used
+
+
+def test_duplicate_rows():
+    # Repeated parts reach the fountain decoder itself, below URDecoder's
+    # duplicate filter
+    message = bytearray(random.Random(SEED).randbytes(2000))
+    encoder = FountainEncoder(message, 60)
+    seq_len = encoder.seq_len()
+    # Start half way through the simple parts, so mixed parts are needed
+    parts = [encoder.next_part() for _ in range(seq_len * 4)][seq_len // 2:]
+
+    used = {}
+    for engine in (Engine_Peeling, Engine_Gaussian):
+        (decoder, used[engine]) = decode_fountain_parts(engine, parts, None)
+        (repeated, repeated_used) = decode_fountain_parts(engine, parts, random.Random(SEED))
+
+        assert decoder.is_success() and repeated.is_success()
+        assert bytes(decoder.result_message()) == bytes(repeated.result_message()) == message
+        assert repeated_used == used[engine]
+
+    assert used[Engine_Gaussian] <= used[Engine_Peeling]
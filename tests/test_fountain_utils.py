@@ -0,0 +1,63 @@
+import random
+
+from foundation.fountain_utils import choose_degree, choose_fragments, fragment_chooser, shuffled, shuffled_prefix
+from foundation.utils import int_to_bytes
+from foundation.xoshiro256 import Xoshiro256
+
+SEED = 5
+TRIPLES = 3000
+
+
+# choose_fragments as it was before drawing only a prefix: shuffle every
+# index, then keep the first `degree`
+def reference_choose_fragments(seq_num, seq_len, checksum):
+    if seq_num <= seq_len:
+        return set([seq_num - 1])
+    else:
+        seed = int_to_bytes(seq_num) + int_to_bytes(checksum)
+        rng = Xoshiro256.from_bytes(seed)
+        degree = choose_degree(seq_len, rng)
+        indexes = []
+
+        for i in range(seq_len):
+            indexes.append(i)
+        shuffled_indexes = shuffled(indexes, rng)
+        return set(shuffled_indexes[0:degree])
+
+
+def random_triples(rng, count):
+    for i in range(count):
+        # A few long messages, whose mixed parts have degrees in the hundreds
+        seq_len = rng.randint(1, 2000) if i % 100 == 0 else rng.randint(1, 200)
+        seq_num = rng.choice([
+            rng.randint(1, seq_len),
+            rng.randint(seq_len + 1, seq_len * 4 + 1),
+            rng.randint(1, 0xffffffff),
+        ])
+        yield (seq_num, seq_len, rng.randint(0, 0xffffffff))
+
+
+def test_choose_fragments_matches_full_shuffle():
+    for seq_num, seq_len, checksum in random_triples(random.Random(SEED), TRIPLES):
+        expected = reference_choose_fragments(seq_num, seq_len, checksum)
+        assert choose_fragments(seq_num, seq_len, checksum) == expected, (seq_num, seq_len, checksum)
+
+
+def test_fragment_chooser_matches_full_shuffle():
+    rng = random.Random(SEED + 1)
+    seq_len, checksum = 150, rng.randint(0, 0xffffffff)
+    chooser = fragment_chooser(seq_len, checksum)
+    # Twice, so the second pass is served from the cache
+    for _ in range(2):
+        for seq_num in range(1, seq_len * 3):
+            assert chooser.choose(seq_num) == reference_choose_fragments(seq_num, seq_len, checksum)
+
+
+def test_shuffled_prefix_matches_shuffled():
+    rng = random.Random(SEED + 2)
+    for _ in range(TRIPLES):
+        length = rng.randint(1, 300)
+        count = rng.randint(0, length)
+        seed = rng.randbytes(8)
+        expected = shuffled(list(range(length)), Xoshiro256.from_bytes(seed))[:count]
+        assert shuffled_prefix(length, count, Xoshiro256.from_bytes(seed)) == expected